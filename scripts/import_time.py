@@ -0,0 +1,78 @@
+"""
+Import-time benchmark
+
+Measures how long importing the benchmark modules takes in a fresh
+interpreter, using `python -X importtime`, and which heavy frameworks each
+of them pulls in. Run it on the board to see the startup cost a backend pays:
+
+    python3 scripts/import_time.py
+    python3 scripts/import_time.py --modules main backends.ncnn --repeat 5
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# frameworks whose import dominates startup
+HEAVY_MODULES = ["torch", "torchvision", "cv2", "PIL", "tensorrt", "pycuda", "onnxruntime", "tflite_runtime", "ncnn"]
+
+DEFAULT_MODULES = [
+    "utils", "main", "backends", "backends.ncnn", "backends.onnx_backend", "backends.tflite", "backends.tensorrt",
+]
+
+
+def import_time(module):
+    """Cumulative import time of `module` in seconds and the heavy modules it imported.
+    Returns None when the import fails.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        return None
+
+    total_us, imported = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # top-level imports are not indented, their cumulative time includes their children
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+        imported.add(name.strip())
+    return total_us / 1e6, sorted(m for m in HEAVY_MODULES if m in imported)
+
+
+def cli_time(repeat):
+    """Wall time of `main.py --list-backends`, i.e. of starting the CLI.
+    """
+    import time
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(SRC_DIR, "main.py"), "--list-backends"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="modules to import")
+    parser.add_argument("--repeat", default=3, type=int, help="imports per module, the median is reported")
+    args = parser.parse_args()
+
+    print(f"{'module':<24} {'import ms':>10}  heavy modules imported")
+    for module in args.modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        if any(run is None for run in runs):
+            print(f"{module:<24} {'failed':>10}  (missing dependency)")
+            continue
+        median = statistics.median(seconds for seconds, _ in runs)
+        print(f"{module:<24} {median * 1000:>10.1f}  {', '.join(runs[0][1]) or '-'}")
+    print(f"\nmain.py --list-backends: {cli_time(args.repeat) * 1000:.1f} ms")
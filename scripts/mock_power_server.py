@@ -0,0 +1,63 @@
+"""
+Local stand-in for the PAC1931 power server
+
+Serves /power-start and /power-stop like the real server, returning
+synthetic vbus/ibus samples for every bus at a fixed rate, plus their
+timestamps in seconds since power-start.
+
+    python3 scripts/mock_power_server.py --port 8096
+    python3 src/main.py ... --power-server http://127.0.0.1:8096
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class MockPowerHandler(BaseHTTPRequestHandler):
+    started = None
+    rate_hz = 10.0
+    buses = 4
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = type(self)
+        if self.path == "/power-start":
+            cls.started = time.monotonic()
+            self._reply({"status": "started"})
+        elif self.path == "/power-stop":
+            elapsed = time.monotonic() - cls.started if cls.started else 0.0
+            count = int(elapsed * cls.rate_hz) + 1
+            timestamps = [i / cls.rate_hz for i in range(count)]
+            vbus, ibus = {}, {}
+            for bus in range(1, cls.buses + 1):
+                vbus[f"vbus{bus}"] = [5.0 + random.uniform(-0.01, 0.01) for _ in timestamps]
+                ibus[f"ibus{bus}"] = [0.5 + random.uniform(-0.05, 0.05) for _ in timestamps]
+            cls.started = None
+            self._reply({"vbus": vbus, "ibus": ibus, "timestamps": timestamps})
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1", type=str, help="address to listen on")
+    parser.add_argument("--port", default=8096, type=int, help="port to listen on")
+    parser.add_argument("--rate", default=10.0, type=float, help="synthetic samples per second")
+    args = parser.parse_args()
+
+    MockPowerHandler.rate_hz = args.rate
+    server = HTTPServer((args.host, args.port), MockPowerHandler)
+    print(f"Mock power server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
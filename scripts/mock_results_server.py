@@ -0,0 +1,76 @@
+"""
+Local stand-in for the results server
+
+Serves /bench/insert and /bench/insert_metric like the real server, plus a
+/bench/insert_batch endpoint for batched uploads, and answers a fraction of
+the requests with an error to exercise the uploader's retries.
+
+    python3 scripts/mock_results_server.py --port 27017 --fail-rate 0.3
+    python3 src/main.py ... --results-url http://127.0.0.1:27017
+"""
+import json
+import random
+import argparse
+import itertools
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class MockResultsHandler(BaseHTTPRequestHandler):
+    ids = itertools.count(1)
+    fail_rate = 0.0
+    verbose = False
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _insert(self, kind, payload):
+        if self.verbose:
+            print(f"{kind}: {json.dumps(payload)[:120]}")
+        if kind == "benchmark":
+            return {"benchmark_id": str(next(self.ids))}
+        if "benchmark_id" not in payload:
+            raise ValueError("metric without benchmark_id")
+        return {"status": "ok"}
+
+    def do_POST(self):
+        cls = type(self)
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if random.random() < cls.fail_rate:
+            self.send_error(503)
+            return
+        try:
+            if self.path == "/bench/insert":
+                self._reply(self._insert("benchmark", payload))
+            elif self.path == "/bench/insert_metric":
+                self._reply(self._insert("metric", payload))
+            elif self.path == "/bench/insert_batch":
+                self._reply({"results": [
+                    self._insert(record["kind"], record["payload"]) for record in payload["records"]
+                ]})
+            else:
+                self.send_error(404)
+        except (KeyError, ValueError) as e:
+            self.send_error(400, str(e))
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1", type=str, help="address to listen on")
+    parser.add_argument("--port", default=27017, type=int, help="port to listen on")
+    parser.add_argument("--fail-rate", default=0.0, type=float, help="fraction of requests answered with 503")
+    parser.add_argument("--verbose", action="store_true", help="print every inserted record")
+    args = parser.parse_args()
+
+    MockResultsHandler.fail_rate = args.fail_rate
+    MockResultsHandler.verbose = args.verbose
+    server = HTTPServer((args.host, args.port), MockResultsHandler)
+    print(f"Mock results server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,78 @@
+"""
+TFLite cpu thread-count sweep
+
+Runs a model on the tflite cpu interpreter for every thread count on every
+core cluster (e.g. the Cortex-A72 "big" and Cortex-A53 "little" cores of an
+RK3399) and reports median latency, speedup over one thread and parallel
+efficiency, to pick `--tflite-threads` and `--cpu-affinity`:
+
+    python3 scripts/tflite_thread_sweep.py --model_path mobilenet_v2.tflite --iterations 200
+"""
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import hardware  # noqa: E402
+from backends.tflite import TfliteBackend  # noqa: E402
+
+
+def measure(model_path, threads, cpus, iterations, warmup, default_delegates=True):
+    backend = TfliteBackend(
+        name="tflite", device="cpu", num_threads=threads, cpus=cpus, default_delegates=default_delegates)
+    backend.load_backend(model_path)
+    shape = backend.input_details['shape']
+    if backend.input_dtype.kind in "iu":
+        info = np.iinfo(backend.input_dtype)
+        inputs = np.random.randint(info.min, info.max + 1, size=shape, dtype=backend.input_dtype)
+    else:
+        inputs = np.random.rand(*shape).astype(backend.input_dtype)
+
+    for _ in range(warmup):
+        backend(inputs)
+    latencies = [backend(inputs)[1] for _ in range(iterations)]
+    backend.destroy()
+    return float(np.median(latencies)) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_path", required=True, type=str, help="tflite model")
+    parser.add_argument("--iterations", default=100, type=int, help="timed invocations per configuration")
+    parser.add_argument("--warmup", default=10, type=int, help="untimed invocations per configuration")
+    parser.add_argument(
+        "--clusters", nargs="+", default=None,
+        help="core sets to sweep (big, little, all or core lists), every cluster and all cores by default")
+    parser.add_argument("--no-default-delegates", action="store_true", help="run without XNNPACK")
+    parser.add_argument("--json", default=None, type=str, help="also write the results to this file")
+    args = parser.parse_args()
+
+    clusters = args.clusters
+    if clusters is None:
+        clusters = [",".join(map(str, cluster)) for cluster in hardware.cpu_clusters()]
+        if len(clusters) > 1:
+            clusters.append("all")
+
+    results = []
+    print(f"{'cores':<16} {'threads':>7} {'median ms':>10} {'speedup':>8} {'efficiency':>10}")
+    for spec in clusters:
+        cpus = hardware.resolve_cpus(spec)
+        single = None
+        for threads in range(1, len(cpus) + 1):
+            latency = measure(
+                args.model_path, threads, spec, args.iterations, args.warmup, not args.no_default_delegates)
+            single = single or latency
+            speedup = single / latency
+            results.append({
+                "cpus": cpus, "threads": threads, "median_ms": round(latency, 3),
+                "speedup": round(speedup, 3), "efficiency": round(speedup / threads, 3),
+            })
+            print(f"{spec:<16} {threads:>7} {latency:>10.3f} {speedup:>8.2f} {speedup / threads:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"model_path": args.model_path, "results": results}, f, indent=2)
@@ -0,0 +1,66 @@
+"""
+Validates the torch-free preprocessing against torchvision
+
+Runs `utils.preprocess_img` (PIL + torchvision) and
+`preprocess_numpy.preprocess_img` (OpenCV + NumPy) on the same images and
+reports their difference and speed. The resize path alone is also compared
+on identical PIL-decoded pixels, so decoder rounding is told apart from
+resampling differences.
+
+    python3 scripts/validate_preprocess.py --imagenet /mnt/workspace/imagenet-2012/val --count 500
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import utils  # noqa: E402
+import preprocess_numpy  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--imagenet", required=True, type=str, help="directory with imagenet images")
+    parser.add_argument("--count", default=200, type=int, help="number of images to compare")
+    parser.add_argument("--size", default=224, type=int, help="input size")
+    parser.add_argument(
+        "--tolerance", default=0.05, type=float,
+        help="largest accepted absolute difference of a normalized value, one uint8 step is about 0.017")
+    args = parser.parse_args()
+
+    from PIL import Image
+    files = sorted(f for f in os.listdir(args.imagenet) if f.lower().endswith('.jpeg'))[:args.count]
+    paths = [os.path.join(args.imagenet, f) for f in files]
+    size = (args.size, args.size)
+    preprocessor = preprocess_numpy.ImagePreprocessor(args.size)
+
+    end_to_end, resize_only = [], []
+    torch_time = numpy_time = 0.0
+    for path in paths:
+        start = time.perf_counter()
+        reference = utils.preprocess_img(path, size=size)
+        torch_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = preprocess_numpy.preprocess_img(path, size=size)
+        numpy_time += time.perf_counter() - start
+        end_to_end.append(np.abs(result - reference).max())
+
+        rgb = np.asarray(Image.open(path).convert('RGB'))
+        resize_only.append(np.abs(preprocessor.from_rgb(rgb) - reference).max())
+
+    end_to_end, resize_only = np.array(end_to_end), np.array(resize_only)
+    print(f"images:               {len(paths)}")
+    print(f"max abs diff:         {end_to_end.max():.5f} (same decode {resize_only.max():.5f})")
+    print(f"mean of max abs diff: {end_to_end.mean():.5f} (same decode {resize_only.mean():.5f})")
+    print(f"identical images:     {np.count_nonzero(end_to_end == 0)} (same decode {np.count_nonzero(resize_only == 0)})")
+    print(f"torchvision:          {torch_time / len(paths) * 1000:.2f} ms/image")
+    print(f"numpy:                {numpy_time / len(paths) * 1000:.2f} ms/image")
+    if end_to_end.max() > args.tolerance:
+        print(f"[FAIL] difference above tolerance {args.tolerance}")
+        sys.exit(1)
+    print("[OK] within tolerance")
@@ -0,0 +1,107 @@
+"""
+Backend registry
+
+Backends are registered as entry points ("module:Class") and imported only
+when they are loaded, so picking one backend never imports the frameworks
+of the others. Availability is checked with `importlib.util.find_spec`,
+which locates a framework without importing it.
+
+The built-in backends are listed in `BUILTIN_BACKENDS`; other packages can
+add backends by declaring entry points in the `mlbench.backends` group.
+"""
+import importlib
+import importlib.util
+
+
+ENTRY_POINT_GROUP = "mlbench.backends"
+
+
+class BackendEntry:
+    """A registered backend.
+    Args:
+        name: name the backend is selected with on the command line
+        target: "module:Class" of the backend class
+        requires: top-level modules of the framework the backend needs
+        aliases: other names selecting the backend
+    """
+    def __init__(self, name, target, requires=(), aliases=()):
+        self.name = name
+        self.target = target
+        self.requires = list(requires)
+        self.aliases = list(aliases)
+
+    def missing(self):
+        """Required modules that are not installed.
+        """
+        missing = []
+        for module in self.requires:
+            try:
+                if importlib.util.find_spec(module) is None:
+                    missing.append(module)
+            except (ImportError, ValueError):
+                missing.append(module)
+        return missing
+
+    def available(self):
+        return not self.missing()
+
+    def load(self):
+        module, attr = self.target.split(":")
+        return getattr(importlib.import_module(module), attr)
+
+
+BUILTIN_BACKENDS = [
+    BackendEntry("tensorrt", "backends.tensorrt:TRTBackend", requires=["tensorrt", "pycuda"]),
+    BackendEntry("onnxruntime", "backends.onnx_backend:ONNXBackend", requires=["onnxruntime"], aliases=["onnx"]),
+    BackendEntry("tflite", "backends.tflite:TfliteBackend", requires=["tflite_runtime"]),
+    BackendEntry("ncnn", "backends.ncnn:NCNNBackend", requires=["ncnn"]),
+]
+
+
+def _plugin_entries():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # python < 3.8
+        return []
+    eps = entry_points()
+    eps = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, "select") else eps.get(ENTRY_POINT_GROUP, [])
+    return [BackendEntry(ep.name, ep.value) for ep in eps]
+
+
+def registry():
+    """All registered backends by name, plugins override built-ins.
+    """
+    entries = {}
+    for entry in BUILTIN_BACKENDS + _plugin_entries():
+        entries[entry.name] = entry
+    return entries
+
+
+def get_entry(name):
+    for entry in registry().values():
+        if name == entry.name or name in entry.aliases:
+            return entry
+    raise ValueError(f"Unknown backend {name}, expected one of {', '.join(registry())}")
+
+
+def load_backend_class(name):
+    """Imports and returns the backend class registered as `name`.
+    """
+    entry = get_entry(name)
+    missing = entry.missing()
+    if missing:
+        raise ImportError(f"Backend {entry.name} needs {', '.join(missing)}, which is not installed")
+    return entry.load()
+
+
+def describe():
+    """One line per backend with its availability, without importing any framework.
+    """
+    lines = []
+    for entry in registry().values():
+        missing = entry.missing()
+        status = "available" if not missing else f"missing {', '.join(missing)}"
+        aliases = f" (alias {', '.join(entry.aliases)})" if entry.aliases else ""
+        lines.append(f"{entry.name:<12} {status:<32} {entry.target}{aliases}")
+    return "\n".join(lines)
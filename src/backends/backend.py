@@ -1,31 +1,132 @@
 """
 Backend Base Class
+
+Backends are called with a batch of preprocessed inputs, i.e. an array with a
+leading batch axis of up to `batch_size` samples, and return the raw outputs
+for that batch together with the inference time. `get_pred` turns those
+outputs into one predicted class id per sample.
+
+Every backend times its stages as spans on `self.timer` (see `timing`), the
+returned inference time is the sum of the copy_in, invoke and copy_out spans.
 """
+import threading
+
+import numpy as np
+
+import utils
+import hardware
+import preprocess_numpy
+import device_profiles
+from timing import Timer
+from telemetry import TelemetrySampler
+from telemetry_store import TelemetryStore
+
 
 class Backend:
-    def __init__(self, name):
+    # layout of a preprocessed sample batch, "NCHW" or "NHWC"
+    input_layout = "NCHW"
+
+    def __init__(self, name, batch_size=1, timer=None):
         self.name = name
-    
+        self.batch_size = batch_size
+        self.timer = timer if timer is not None else Timer()
+        # rate of the telemetry sampled by capture_stats and the board
+        # profile it is sampled with, loaded from the device tree if unset
+        self.telemetry_hz = 10.0
+        self.device_profile = None
+        # "numpy" for the torch-free preprocess_numpy path, "torchvision"
+        # for utils.preprocess_img, used by backends taking torchvision inputs
+        self.preprocess_impl = "numpy"
+
+    @classmethod
+    def from_args(cls, args):
+        """Creates the backend from the `main.py` command line arguments.
+        """
+        raise NotImplementedError("from_args not implemented")
+
+    def torchvision_preprocess_func(self):
+        """Resize -> CenterCrop -> ToTensor -> Normalize, in the implementation
+        selected by `preprocess_impl`.
+        """
+        if self.preprocess_impl == "torchvision":
+            return utils.preprocess_img
+        return preprocess_numpy.preprocess_img
+
+    def input_quantization(self):
+        """Quantization of the model input once loaded, as a dict of `scale`,
+        `zero_point` and integer `dtype`, or None for float inputs. When set
+        the preprocessed dataset is stored quantized.
+        """
+        return None
+
+    def set_timer(self, timer):
+        self.timer = timer
+
+    def hardware_info(self):
+        """Cached fingerprint of the machine the backend runs on, see `hardware`.
+        """
+        return hardware.fingerprint()
+
+    def _as_batch(self, inputs, sample_ndim=3):
+        """Adds the batch axis to a single sample, batches pass through unchanged.
+        """
+        if inputs.ndim == sample_ndim:
+            inputs = np.expand_dims(inputs, axis=0)
+        if len(inputs) > self.batch_size:
+            raise ValueError(f"Got a batch of {len(inputs)} inputs, backend batch size is {self.batch_size}")
+        return inputs
+
     def warmup(self, data, warmup_steps=100):
         raise NotImplementedError("warmup not implemented")
-    
+
     def name(self):
         raise NotImplementedError("name not implemented")
 
     def version(self):
         raise NotImplementedError("version not implemented")
-    
+
     def load_backend(self):
         raise NotImplementedError("load not implemented")
-    
-    def __call__(self):
+
+    def __call__(self, inputs):
         raise NotImplementedError("predict not implemented")
-        
+
+    def stream(self, batches):
+        """Runs inference over an iterable of (ids, inputs, labels) batches and
+        yields (ids, labels, outputs, infer_time) in the same order. Backends
+        that can keep several batches in flight override this.
+        """
+        for ids, inputs, labels in batches:
+            outputs, infer_time = self(inputs)
+            yield ids, labels, outputs, infer_time
+
+    def get_pred(self, outputs):
+        raise NotImplementedError("get_pred not implemented")
+
     def capture_stats(self):
-        raise NotImplementedError("capture_stats not implemented")
-    
+        """Starts sampling board telemetry into `self.telemetry` until
+        `self.stop_event` is set, with tegrastats or the sysfs sampler
+        depending on the device profile.
+        """
+        if self.device_profile is None:
+            self.device_profile = device_profiles.load_profile()
+        self.stop_event = threading.Event()
+        self.telemetry = TelemetryStore()
+        if self.device_profile.telemetry == "tegrastats":
+            self.process, self.stats_thread = utils.start_tegrastats(
+                self.telemetry.append, self.stop_event, interval_ms=1000 / self.telemetry_hz)
+        else:
+            self.sampler = TelemetrySampler(
+                self.device_profile.build_sources(), self.telemetry.append, rate_hz=self.telemetry_hz)
+            self.stats_thread = self.sampler.start(self.stop_event)
+
     def get_avg_stats(self):
-        raise NotImplementedError("get_avg_stats not implemented")
-    
+        """Telemetry captured since `capture_stats`, one array per metric with
+        a row per sample and a `timestamp` column in nanoseconds.
+        """
+        if getattr(self, "telemetry", None) is None:
+            raise NotImplementedError("get_avg_stats not implemented")
+        return self.telemetry.snapshot()
+
     def destroy(self):
         raise NotImplementedError("destroy not implemented")
@@ -1,83 +1,122 @@
+import os
 import ncnn
 import numpy as np
-import threading
-from queue import Queue
 
 from backends.backend import Backend
-from models.ncnn import Resnet50
+from models.ncnn import NCNNNet, model_entry
 
 import utils
+import hardware
+import preprocess_numpy
 
 
 class NCNNBackend(Backend):
-    def __init__(self, name="ncnn"):
-        super(NCNNBackend, self).__init__(name)
-        self.precision = "fp32"
-    
+    # samples are pixels, ncnn normalizes them with the manifest's mean/norm
+    input_layout = "NHWC"
+
+    def __init__(self, name="ncnn", batch_size=1, num_threads=None, light_mode=True, fp16=False,
+                 winograd=True, sgemm=True, cpus=None):
+        """Initialize.
+        Args:
+            num_threads (int): ncnn threads, ncnn's default (the big cores) if None
+            light_mode (bool): release intermediate blobs once consumed
+            fp16 (bool): fp16 storage, packing and arithmetic
+            winograd, sgemm (bool): allow these convolution implementations
+            cpus (str): cores the ncnn threads run on, see `hardware.resolve_cpus`
+        """
+        super(NCNNBackend, self).__init__(name, batch_size=batch_size)
+        self.precision = "fp16" if fp16 else "fp32"
+        self.net_options = {
+            "num_threads": num_threads, "light_mode": light_mode, "fp16": fp16,
+            "winograd": winograd, "sgemm": sgemm,
+        }
+        self.cpus = cpus
+        self.output_buffer = None
+
+    @classmethod
+    def from_args(cls, args):
+        # the preprocessed dataset has to be the size the model takes
+        input_size = model_entry(args.model_name)["input_size"]
+        if list(args.input_size) != list(input_size):
+            raise ValueError(
+                f"The ncnn {args.model_name} model takes inputs of {input_size[0]},{input_size[1]}, "
+                f"got --input_size {args.input_size[0]},{args.input_size[1]}")
+        return cls(
+            batch_size=args.batch_size, num_threads=args.ncnn_threads, light_mode=not args.ncnn_no_light_mode,
+            fp16=args.ncnn_fp16, winograd=not args.ncnn_no_winograd, sgemm=not args.ncnn_no_sgemm,
+            cpus=args.cpu_affinity)
+
+    def get_accelerator(self):
+        return ""
+
     def name(self):
         return self.name
     
     def version(self):
         return ncnn.__version__
     
+    def get_preprocess_func(self, model_name):
+        # raises for models missing from the manifest
+        model_entry(model_name)
+        return preprocess_numpy.preprocess_pixels
+
     def warmup(self, data, warmup_steps=20):
         for i in range(warmup_steps):
             self(data)
 
-    def load_backend(self, model_path, model_name=None, inputs=None, outputs=None):
-        param_file, bin_file = f"{model_path}.param", f"{model_path}.bin"
-        if param_file.endswith("resnet50_v1.param"):
-            # download model files if doesn't
-            self.net = Resnet50(param_file, bin_file)
-            self.model_name = "resnet50"
-        else:
-            import sys
-            print("please add your ncnn model .param and .bin files to dir named 'resnet'")
-            sys.exit()
-        
-        if not inputs:
-            self.inputs = [self.net.input_name]
-        else:
-            self.inputs = inputs
-        if not outputs:
-            self.outputs = [self.net.output_name]
-        else:
-            self.outputs = outputs
+    def load_backend(self, model_path, model_name=None):
+        """Loads `model_path`.param and .bin, or downloads the files the
+        manifest in config/models.json lists for `model_name`.
+        """
+        self.model_name = model_name
+        entry = model_entry(model_name)
+        if model_path is not None:
+            model_path = os.path.splitext(model_path)[0] if model_path.endswith((".param", ".bin")) else model_path
+        if model_path is None or not os.path.exists(f"{model_path}.param"):
+            if not (entry["param"] and entry["bin"]):
+                raise ValueError(
+                    f"config/models.json has no download links for the ncnn {model_name} model, "
+                    "pass its .param and .bin files with --model_path")
+            model_path = utils.download_model(model_name, self.name)
+
+        if self.cpus is not None:
+            # ncnn's thread pool starts on the first run and inherits the affinity
+            hardware.pin_cpus(hardware.resolve_cpus(self.cpus))
+        self.net = NCNNNet.from_manifest(
+            entry, f"{model_path}.param", f"{model_path}.bin", timer=self.timer, **self.net_options)
+        self.inputs = [self.net.input_name]
+        self.outputs = [self.net.output_name]
         return self
-    
+
     def __call__(self, inputs):
-        return self.net(inputs)
-    
-    def capture_stats(self):
-        self.stop_event = threading.Event()
-        self.output_queue = Queue()
-        self.psutil_thread = threading.Thread(
-            target=utils.get_stats_rockpi, args=(self.output_queue, self.stop_event), daemon=True)
-        self.psutil_thread.start()
-    
-    def get_avg_stats(self):
-        cpu_util, ram_usage, temp, cpu_freq = [], [], [], []
-        
-        while not self.output_queue.empty():
-            c, r, t, cf = self.output_queue.get()
-            ram_usage.append(r)
-            cpu_util.append(c)
-            temp.append(t)
-            cpu_freq.append(cf)
-        ram_usage, cpu_util, temp = np.array(ram_usage), np.array(cpu_util), np.array(temp)
-        stats = {
-            "cpu": cpu_util,
-            "memory": ram_usage,
-            "temperature": temp,
-            "cpu_freq": cpu_freq
-        }
-        return stats
+        # ncnn.Mat has no batch axis, run the samples one after another
+        self.timer.begin()
+        inputs = self._as_batch(inputs)
+        for i, sample in enumerate(inputs):
+            if self.output_buffer is None:
+                # sized on the first output, reused by every later call
+                scores, _ = self.net(sample)
+                self.output_buffer = np.empty((self.batch_size, len(scores)), dtype=scores.dtype)
+                self.output_buffer[i] = scores
+            else:
+                self.net(sample, out=self.output_buffer[i])
+        # a view of the output buffer, valid until the next call
+        return self.output_buffer[:len(inputs)], self.timer.call_time()
     
+    def set_timer(self, timer):
+        super(NCNNBackend, self).set_timer(timer)
+        if hasattr(self, "net"):
+            self.net.timer = timer
+
     def get_pred(self, outputs):
-        return outputs.argmax()
+        with self.timer.span("postprocess"):
+            return outputs.argmax(axis=1)
     
     def destroy(self):
         self.net.destroy()
-        self.psutil_thread.join()
+        self.stats_thread.join()
         del self.net
+        if self.cpus is not None:
+            # the next backend of a sweep starts from the original affinity
+            hardware.unpin()
         
\ No newline at end of file
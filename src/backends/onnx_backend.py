@@ -1,103 +1,238 @@
-import time
-import threading
-import subprocess
-import requests
+import os
+import hashlib
 import numpy as np
 import onnxruntime as ort
 
-from tqdm import tqdm
-from queue import Queue
-
-import utils
+import hardware
 from backends.backend import Backend
 
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+# numpy dtypes of onnx tensor types
+TENSOR_TYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(uint8)": np.uint8,
+    "tensor(int8)": np.int8,
+}
+
+OPTIMIZED_MODEL_DIR = os.path.expanduser(os.path.join("~", ".cache", "mlbench", "ort"))
+
+
 class ONNXBackend(Backend):
-    def __init__(self, name, precision=None, device="cpu"):
-        super(ONNXBackend, self).__init__(name)
+    def __init__(self, name, precision=None, device="cpu", batch_size=1, providers=None,
+                 graph_optimization="all", intra_op_threads=0, inter_op_threads=0, execution_mode="sequential",
+                 optimized_model_dir=OPTIMIZED_MODEL_DIR, io_binding=True, profile_dir=None):
+        """Initialize.
+        Args:
+            providers (list): execution providers in order of preference,
+            unavailable ones are skipped and the cpu provider is always last;
+            defaults to cuda then cpu on a "cuda"/"gpu" device
+            graph_optimization (str): disable, basic, extended or all
+            intra_op_threads, inter_op_threads (int): thread pool sizes, 0 lets
+            onnxruntime decide
+            execution_mode (str): sequential or parallel
+            optimized_model_dir (str): directory caching the optimized graph of
+            every model, None to optimize on every session start
+            io_binding (bool): run with inputs and outputs bound to
+            preallocated buffers
+            profile_dir (str): write an onnxruntime profile to this directory
+        """
+        super(ONNXBackend, self).__init__(name, batch_size=batch_size)
         self.precision = "fp32" if precision is None else precision
         self.device = device
-        if self.device in ["cuda", "gpu"]:
-            self.accelerator = utils.build_and_run_device_query()
-        else:
-            self.accelerator = ""
-    
+        if providers is None:
+            providers = ["CUDAExecutionProvider"] if self.device in ["cuda", "gpu"] else []
+        self.requested_providers = list(providers)
+        self.graph_optimization = graph_optimization
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.execution_mode = execution_mode
+        self.optimized_model_dir = optimized_model_dir
+        self.io_binding = io_binding
+        self.profile_dir = profile_dir
+        self.profile_path = None
+        self.accelerator = ""
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            name="onnxruntime", device=args.device, batch_size=args.batch_size,
+            providers=args.ort_providers.split(",") if args.ort_providers else None,
+            graph_optimization=args.ort_graph_optimization, intra_op_threads=args.ort_intra_threads,
+            inter_op_threads=args.ort_inter_threads, execution_mode=args.ort_execution_mode,
+            optimized_model_dir=None if args.ort_no_optimized_cache else args.ort_optimized_cache,
+            io_binding=not args.ort_no_io_binding, profile_dir=args.ort_profile)
+
     def get_accelerator(self):
         return self.accelerator
 
     def name(self):
         return self.name
-    
+
     def version(self):
         return ort.__version__
-    
+
     def get_preprocess_func(self, model_name):
         model_names = ["mobilenet_v2", "mobilenet_v3_small", "mobilenet_v3_large"]
         if model_name not in model_names:
             raise ValueError(f"Please provide a valid model name from {model_names}")
-        return utils.preprocess_img
+        return self.torchvision_preprocess_func()
 
     def warmup(self, inputs, warmup_steps=100):
         for step in range(warmup_steps):
             self(inputs)
 
+    def _providers(self):
+        """Requested providers this onnxruntime build has, cpu last.
+        """
+        available = ort.get_available_providers()
+        providers = []
+        for provider in self.requested_providers + ["CPUExecutionProvider"]:
+            if provider not in available:
+                print(f"[WARN] {provider} is not available in this onnxruntime build, skipping it")
+            elif provider not in providers:
+                providers.append(provider)
+        return providers
+
+    def _session_options(self):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            options.enable_profiling = True
+            options.profile_file_prefix = os.path.join(self.profile_dir, f"ort_{self.model_name}")
+        return options
+
+    def _optimized_model_path(self, model_path, providers):
+        """Cache path of the optimized graph. Graphs optimized past the basic
+        level can hold provider specific nodes, so the key covers the model
+        contents, the onnxruntime version, the level and the providers.
+        """
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(f"{ort.__version__}:{self.graph_optimization}:{','.join(providers)}".encode())
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        return os.path.join(self.optimized_model_dir, f"{name}_{digest.hexdigest()[:16]}.onnx")
+
+    def _create_session(self, model_path, providers):
+        options = self._session_options()
+        if self.optimized_model_dir is None or self.graph_optimization == "disable":
+            return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+        optimized_path = self._optimized_model_path(model_path, providers)
+        if os.path.exists(optimized_path):
+            # already optimized, skip the graph transformations at session start
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS["disable"]
+            return ort.InferenceSession(optimized_path, sess_options=options, providers=providers)
+
+        os.makedirs(self.optimized_model_dir, exist_ok=True)
+        options.optimized_model_filepath = optimized_path + ".tmp"
+        session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        if os.path.exists(optimized_path + ".tmp"):
+            os.replace(optimized_path + ".tmp", optimized_path)
+        return session
+
     def load_backend(self, model_path, model_name):
         self.model_name = model_name
-        if self.device == "cuda" and len(ort.get_all_providers()) > 1:
-            self.model = ort.InferenceSession(model_path, providers=["CUDAExecutionProvider"])
-        else:
-            self.model = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.model = self._create_session(model_path, self._providers())
+        self.providers = self.model.get_providers()
+        if "CUDAExecutionProvider" in self.providers:
+            self.accelerator = hardware.fingerprint()["gpu"]["name"] or ""
 
-        self.input_name = self.model.get_inputs()[0].name
-        self.output_name = self.model.get_outputs()[0].name
+        model_input, model_output = self.model.get_inputs()[0], self.model.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+        self.input_dtype = np.dtype(TENSOR_TYPES.get(model_input.type, np.float32))
+        if not all(isinstance(dim, int) for dim in model_input.shape[1:]):
+            print("[WARN] Model input has dynamic dims besides the batch, running without io binding")
+            self.io_binding = False
+        if self.io_binding:
+            self._allocate_bindings(model_input, model_output)
+
+    def _allocate_bindings(self, model_input, model_output):
+        """Host buffers for a full batch, bound as OrtValues sharing their
+        memory; a smaller batch binds a leading slice of them.
+        """
+        self.binding = self.model.io_binding()
+        self.input_buffer = np.empty([self.batch_size] + list(model_input.shape[1:]), dtype=self.input_dtype)
+        output_shape = model_output.shape[1:]
+        # outputs with dynamic dims besides the batch are allocated by onnxruntime
+        self.output_buffer = None
+        if all(isinstance(dim, int) for dim in output_shape):
+            self.output_buffer = np.empty(
+                [self.batch_size] + list(output_shape), dtype=TENSOR_TYPES.get(model_output.type, np.float32))
+        self.bound_batch = None
+
+    def _bind(self, batch):
+        if self.bound_batch == batch:
+            return
+        self.binding.clear_binding_inputs()
+        self.binding.clear_binding_outputs()
+        if "CUDAExecutionProvider" in self.providers:
+            # copied to the device by onnxruntime on every run
+            self.binding.bind_cpu_input(self.input_name, self.input_buffer[:batch])
+        else:
+            self.binding.bind_ortvalue_input(
+                self.input_name, ort.OrtValue.ortvalue_from_numpy(self.input_buffer[:batch]))
+        if self.output_buffer is not None:
+            self.binding.bind_ortvalue_output(
+                self.output_name, ort.OrtValue.ortvalue_from_numpy(self.output_buffer[:batch]))
+        else:
+            self.binding.bind_output(self.output_name, "cpu")
+        self.bound_batch = batch
 
     def __call__(self, inputs):
-        if len(inputs.shape) == 3:
-            inputs = np.expand_dims(inputs, axis=0)
-        input_dict = {self.input_name: inputs.astype(np.float32)}
-
-        start = time.time()
-        outputs = self.model.run([self.output_name], input_dict)[0]
-        infer_time = time.time() - start
-        return outputs, infer_time
-    
-    def capture_stats(self):
-        self.stop_event = threading.Event()
-        self.output_queue = Queue()
-        self.process = subprocess.Popen(
-            ['tegrastats'], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE
-        )
-        self.tegrastats_thread = threading.Thread(
-            target=utils.read_tegrastats_output,
-            args=(self.process, self.output_queue, self.stop_event),
-            daemon=True
-        )
-        self.tegrastats_thread.start()
-    
-    def get_avg_stats(self):
-        ram_usage, cpu_util, gpu_util, temp, cpu_freq = [], [], [], [], []
-        
-        while not self.output_queue.empty():
-            r,c,g,t, cf = self.output_queue.get()
-            ram_usage.append(r)
-            cpu_util.append(c)
-            gpu_util.append(g)
-            temp.append(t)
-            cpu_freq.append(cf)
-        ram_usage, cpu_util, temp = np.array(ram_usage), np.array(cpu_util),  np.array(temp)
-        
-        stats = {
-            "cpu": cpu_util,
-            "memory": ram_usage,
-            "temperature": temp,
-            "gpu_util": gpu_util,
-            "cpu_freq": cpu_freq
-        }
-        return stats
+        # the batch axis of the exported graph has to be dynamic for batch_size > 1
+        self.timer.begin()
+        if not self.io_binding:
+            with self.timer.span("copy_in"):
+                inputs = self._as_batch(inputs)
+                input_dict = {self.input_name: inputs.astype(self.input_dtype, copy=False)}
+            with self.timer.span("invoke"):
+                outputs = self.model.run([self.output_name], input_dict)[0]
+            return outputs, self.timer.call_time()
+
+        with self.timer.span("copy_in"):
+            inputs = self._as_batch(inputs)
+            batch = len(inputs)
+            if not np.shares_memory(inputs, self.input_buffer):
+                np.copyto(self.input_buffer[:batch], inputs, casting='same_kind')
+            self._bind(batch)
+        with self.timer.span("invoke"):
+            self.model.run_with_iobinding(self.binding)
+        with self.timer.span("copy_out"):
+            # views of the bound buffer, valid until the next call
+            if self.output_buffer is not None:
+                outputs = self.output_buffer[:batch]
+            else:
+                outputs = self.binding.copy_outputs_to_cpu()[0]
+        return outputs, self.timer.call_time()
 
     def get_pred(self, outputs):
-        return np.array(outputs).argmax()
-    
+        with self.timer.span("postprocess"):
+            outputs = np.asarray(outputs)
+            return outputs.reshape(len(outputs), -1).argmax(axis=1)
+
     def destroy(self):
+        if self.profile_dir:
+            self.profile_path = self.model.end_profiling()
+            print(f"[INFO] onnxruntime profile written to {self.profile_path}")
         del self.model
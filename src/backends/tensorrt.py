@@ -1,32 +1,46 @@
-import argparse
-import time
-import psutil
 import os
 import numpy as np
 import tensorrt as trt
 import pycuda.autoinit  # noqa # pylint: disable=unused-import
 import pycuda.driver as cuda
-import threading
-import subprocess
-import requests
 
-from tqdm import tqdm
-from queue import Queue
+from collections import deque
 
 import utils
+import hardware
 from backends.backend import Backend
 
 
 class TRTBackend(Backend):
     """TensorRT inference utility class.
     """
-    def __init__(self, name, precision=None):
+    def __init__(self, name, precision=None, batch_size=1, num_streams=1, profile_copies=False):
         """Initialize.
+        Args:
+            num_streams (int): number of cuda streams, each with its own
+            execution context and buffers, kept busy by `stream`
+            profile_copies (bool): time h2d copy, compute and d2h copy
+            separately with cuda events
         """
-        super(TRTBackend, self).__init__(name)
+        super(TRTBackend, self).__init__(name, batch_size=batch_size)
+        self.num_streams = max(1, num_streams)
+        self.profile_copies = profile_copies
+        self.stage_times = {"h2d": [], "compute": [], "d2h": []}
         self.precision = "fp32" if precision is None else precision
-        self.accelerator = utils.build_and_run_device_query()
+        self.accelerator = hardware.fingerprint()["gpu"]["name"] or ""
     
+    @classmethod
+    def from_args(cls, args):
+        if args.model_path is not None:
+            precision = "fp16" if "fp16" in args.model_path else "fp32"
+        elif args.precision is not None:
+            precision = args.precision
+        else:
+            precision = "fp16"
+        return cls(
+            name="tensorrt", precision=precision, batch_size=args.batch_size, num_streams=args.trt_streams,
+            profile_copies=args.trt_profile_copies)
+
     def get_accelerator(self):
         return self.accelerator
 
@@ -41,11 +55,13 @@ class TRTBackend(Backend):
             "inception_v3", "inception_v4", "efficientnet_small_b0", "efficientnet_medium_b1", "efficientnet_large_b3"]
         if model_name not in model_names:
             raise ValueError(f"Please provide a valid model name from {model_names}")
-        return utils.preprocess_img
+        return self.torchvision_preprocess_func()
     
     def warmup(self, inputs, warmup_steps=100):
         for step in range(warmup_steps):
             self(inputs)
+        # keep warmup out of the copy/compute breakdown
+        self.stage_times = {stage: [] for stage in self.stage_times}
         
     def load_backend(self, model_path, model_name):
         self.model_name = model_name
@@ -63,14 +79,14 @@ class TRTBackend(Backend):
         self._bindings = None
 
         if model_path is None or not os.path.exists(model_path):
-            if self.version() == '8.2.1.9' and utils.get_device_model() == "NVIDIA Jetson Nano 2GB Developer Kit":
+            if self.version() == '8.2.1.9' and hardware.fingerprint()["device_model"] == "NVIDIA Jetson Nano 2GB Developer Kit":
                 print(f"{model_path} doesnt exist! Downloading model for this device ...")
                 model_path = utils.download_model(model_name, self.name, self.precision)
             else:
                 raise FileNotFoundError(f"Please provide a valid model to load.")
 
         self._load_model(model_path)
-        self._allocate_buffers()
+        self._allocate_slots()
 
     def _deserialize_engine(self, trt_engine_path: str) -> trt.tensorrt.ICudaEngine:
         """Deserialize TensorRT Cuda Engine
@@ -85,25 +101,79 @@ class TRTBackend(Backend):
 
         return engine
     
-    def _allocate_buffers(self) -> None:
-        """Allocates memory for inference using TensorRT engine.
+    def _allocate_buffers(self, profile: int = 0) -> dict:
+        """Allocates memory for inference using TensorRT engine, large enough
+        for `batch_size` samples.
+        Args:
+            profile (int): optimization profile whose bindings are allocated,
+            every concurrently running context of a dynamic engine needs its own
+        Returns:
+            dict: input/output host and device buffers and the bindings list
         """
-        inputs, outputs, bindings = [], [], []
-        for binding in self._engine:
-            size = trt.volume(self._engine.get_binding_shape(binding))
-            dtype = trt.nptype(self._engine.get_binding_dtype(binding))
+        inputs, outputs = [], []
+        bindings = [0] * self._engine.num_bindings
+        self._implicit_batch = self._engine.has_implicit_batch_dimension
+        self._dynamic_batch = False
+        if self._implicit_batch and self.batch_size > self._engine.max_batch_size:
+            raise ValueError(
+                f"Batch size {self.batch_size} exceeds the engine max batch size {self._engine.max_batch_size}.")
+
+        # bindings are repeated once per optimization profile
+        bindings_per_profile = self._engine.num_bindings // self._engine.num_optimization_profiles
+        for index in range(profile * bindings_per_profile, (profile + 1) * bindings_per_profile):
+            shape = list(self._engine.get_binding_shape(index))
+            if self._implicit_batch:
+                shape = [self.batch_size] + shape
+            elif shape[0] == -1:
+                # dynamic batch axis, needs an optimization profile covering batch_size
+                self._dynamic_batch = True
+                shape[0] = self.batch_size
+            elif shape[0] < self.batch_size:
+                raise ValueError(
+                    f"Batch size {self.batch_size} exceeds the engine batch size {shape[0]}.")
+            size = trt.volume(shape)
+            dtype = trt.nptype(self._engine.get_binding_dtype(index))
             host_mem = cuda.pagelocked_empty(size, dtype)
             device_mem = cuda.mem_alloc(host_mem.nbytes)
-            bindings.append(int(device_mem))
-            if self._engine.binding_is_input(binding):
-                inputs.append({'host': host_mem, 'device': device_mem})
+            bindings[index] = int(device_mem)
+            buffer = {'host': host_mem, 'device': device_mem, 'shape': shape, 'index': index}
+            if self._engine.binding_is_input(index):
+                inputs.append(buffer)
             else:
-                outputs.append({'host': host_mem, 'device': device_mem})
+                outputs.append(buffer)
+
+        return {'inputs': inputs, 'outputs': outputs, 'bindings': bindings, 'bound_batch': None}
+
+    def _allocate_slots(self) -> None:
+        """Creates one slot per stream, each with its own execution context,
+        cuda stream, pinned host buffers and device buffers, so that copies
+        and compute of different batches can overlap.
+        """
+        slot = self._allocate_buffers()
+        slot.update({'context': self._context, 'stream': self._stream})
+        self._slots = [slot]
+        if self.num_streams > 1 and self._dynamic_batch \
+                and self._engine.num_optimization_profiles < self.num_streams:
+            raise ValueError(
+                f"{self.num_streams} streams need as many optimization profiles in a dynamic engine, "
+                f"found {self._engine.num_optimization_profiles}.")
+
+        for i in range(1, self.num_streams):
+            profile = i if self._dynamic_batch else 0
+            slot = self._allocate_buffers(profile)
+            slot['stream'] = cuda.Stream()
+            slot['context'] = self._engine.create_execution_context()
+            if self._dynamic_batch:
+                slot['context'].set_optimization_profile_async(profile, slot['stream'].handle)
+            self._slots.append(slot)
+        for slot in self._slots:
+            for event in ['start', 'end', 'h2d_start', 'h2d_end', 'compute_end', 'd2h_end']:
+                slot[event] = cuda.Event()
 
         # set buffers
-        self._inputs = inputs
-        self._outputs = outputs
-        self._bindings = bindings
+        self._inputs = self._slots[0]['inputs']
+        self._outputs = self._slots[0]['outputs']
+        self._bindings = self._slots[0]['bindings']
 
     def _load_model(self, engine_path):
         print("[INFO] Deserializing TensorRT engine ...")
@@ -129,35 +199,145 @@ class TRTBackend(Backend):
             inputs (np.ndarray): channels-first format,
             with/without batch axis
         Returns:
-            List[np.ndarray]: inference's output (raw tensorrt output)
+            List[np.ndarray]: inference's output (raw tensorrt output),
+            one (batch, -1) array per output binding
 
         """
+        self.timer.begin()
+        inputs = self._as_batch(inputs)
+        batch = len(inputs)
         self._ctx.push()
 
-        # copy inputs to input memory
-        # without astype gives invalid arg error
-        self._inputs[0]['host'] = inputs.ravel()
-
-        # transfer data to the gpu
-        start = time.time()
-        cuda.memcpy_htod_async(
-            self._inputs[0]['device'], self._inputs[0]['host'], self._stream)
+        # copy inputs into the pinned input memory and transfer data to the gpu,
+        # the copies are asynchronous so on the host side the device time of
+        # h2d/d2h ends up in the invoke span, see profile_copies for the split
+        with self.timer.span("copy_in"):
+            self._copy_in(self._slots[0], inputs)
         
-        # run inference
-        self._context.execute_async(
-            batch_size=1,
-            bindings=self._bindings,
-            stream_handle=self._stream.handle)
-    
-        # fetch outputs from gpu
-        for out in self._outputs:
-            cuda.memcpy_dtoh_async(out['host'], out['device'], self._stream)
-
-        # synchronize stream
-        self._stream.synchronize()
-        infer_time = time.time() - start
+        # run inference, fetch outputs from gpu and synchronize stream
+        with self.timer.span("invoke"):
+            self._enqueue(self._slots[0], batch)
+            self._stream.synchronize()
+        if self.profile_copies:
+            self._record_stage_times(self._slots[0])
         self._ctx.pop()
-        return [out['host'] for out in self._outputs], infer_time
+
+        with self.timer.span("copy_out"):
+            outputs = [self._debatch(out, batch) for out in self._outputs]
+        return outputs, self.timer.call_time()
+
+    def _copy_in(self, slot, inputs):
+        """Stages `inputs` in the pinned host buffer of a slot and enqueues
+        the host to device copy. Copying from pageable memory would make
+        `memcpy_htod_async` synchronous.
+        """
+        buffer = slot['inputs'][0]
+        host = buffer['host']
+        if tuple(inputs.shape[1:]) != tuple(buffer['shape'][1:]):
+            raise ValueError(
+                f"Input sample shape {inputs.shape[1:]} does not match the engine input {buffer['shape'][1:]}.")
+        staged = host[:inputs.size]
+        # same_kind lets float64 inputs through but refuses e.g. float -> int
+        np.copyto(staged.reshape(inputs.shape), inputs, casting='same_kind')
+
+        stream = slot['stream']
+        if self.profile_copies:
+            slot['h2d_start'].record(stream)
+        cuda.memcpy_htod_async(buffer['device'], staged, stream)
+        if self.profile_copies:
+            slot['h2d_end'].record(stream)
+
+    def _record_stage_times(self, slot):
+        """Splits the last batch of a slot into h2d/compute/d2h times in
+        seconds, must be called after the slot's stream was synchronized.
+        """
+        self.stage_times["h2d"].append(slot['h2d_start'].time_till(slot['h2d_end']) / 1000)
+        self.stage_times["compute"].append(slot['h2d_end'].time_till(slot['compute_end']) / 1000)
+        self.stage_times["d2h"].append(slot['compute_end'].time_till(slot['d2h_end']) / 1000)
+
+    def get_stage_times(self):
+        """Mean h2d/compute/d2h time per batch in milliseconds, empty unless
+        the backend was created with `profile_copies`.
+        """
+        return {
+            stage: round(float(np.mean(times)) * 1000, 3)
+            for stage, times in self.stage_times.items() if len(times)
+        }
+
+    def _enqueue(self, slot, batch):
+        """Enqueues inference and the output copies of a slot on its stream.
+        """
+        stream = slot['stream']
+        if self._implicit_batch:
+            slot['context'].execute_async(
+                batch_size=batch,
+                bindings=slot['bindings'],
+                stream_handle=stream.handle)
+        else:
+            if self._dynamic_batch and slot['bound_batch'] != batch:
+                slot['context'].set_binding_shape(
+                    slot['inputs'][0]['index'], (batch, *slot['inputs'][0]['shape'][1:]))
+                slot['bound_batch'] = batch
+            slot['context'].execute_async_v2(
+                bindings=slot['bindings'],
+                stream_handle=stream.handle)
+        if self.profile_copies:
+            slot['compute_end'].record(stream)
+
+        for out in slot['outputs']:
+            cuda.memcpy_dtoh_async(out['host'], out['device'], stream)
+        if self.profile_copies:
+            slot['d2h_end'].record(stream)
+
+    def _debatch(self, out, batch):
+        sample_size = out['host'].size // out['shape'][0]
+        return out['host'][:batch * sample_size].reshape(batch, sample_size)
+
+    def _submit(self, slot, inputs):
+        batch = len(inputs)
+        slot['batch'] = batch
+        slot['start'].record(slot['stream'])
+        # the host buffer of a slot is only rewritten after its stream was synchronized
+        self._copy_in(slot, inputs)
+        self._enqueue(slot, batch)
+        slot['end'].record(slot['stream'])
+
+    def _collect(self, slot):
+        slot['stream'].synchronize()
+        latency = slot['start'].time_till(slot['end']) / 1000
+        if self.profile_copies:
+            self._record_stage_times(slot)
+        # copy, the pinned output buffers are reused by the next batch of this slot
+        outputs = [self._debatch(out, slot['batch']).copy() for out in slot['outputs']]
+        ids, labels = slot.pop('meta')
+        return ids, labels, outputs, latency
+
+    def stream(self, batches):
+        """Keeps up to `num_streams` batches in flight, one per slot, and
+        yields their results in submission order. The reported time of a
+        batch is its latency on the gpu stream, from the start of its input
+        copy to the end of its output copy, measured with cuda events.
+        """
+        if self.num_streams == 1:
+            yield from super(TRTBackend, self).stream(batches)
+            return
+
+        free, in_flight = deque(self._slots), deque()
+        self._ctx.push()
+        try:
+            for ids, inputs, labels in batches:
+                if not free:
+                    slot = in_flight.popleft()
+                    yield self._collect(slot)
+                    free.append(slot)
+                slot = free.popleft()
+                slot['meta'] = (ids, labels)
+                self._submit(slot, self._as_batch(inputs))
+                in_flight.append(slot)
+            while in_flight:
+                yield self._collect(in_flight.popleft())
+        finally:
+            self._ctx.pop()
 
     def destroy(self):
         """Destroy if any context in the stack.
@@ -167,42 +347,7 @@ class TRTBackend(Backend):
         except Exception as exception:
             pass
     
-    def capture_stats(self):
-        self.stop_event = threading.Event()
-        self.output_queue = Queue()
-        self.process = subprocess.Popen(
-            ['tegrastats'], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE
-        )
-        self.tegrastats_thread = threading.Thread(
-            target=utils.read_tegrastats_output,
-            args=(self.process, self.output_queue, self.stop_event),
-            daemon=True
-        )
-        self.tegrastats_thread.start()
-    
-    def get_avg_stats(self):
-        ram_usage, cpu_util, gpu_util, temp, cpu_freq = [], [], [], [], []
-        
-        while not self.output_queue.empty():
-            r,c,g,t, cf = self.output_queue.get()
-            ram_usage.append(r)
-            cpu_util.append(c)
-            gpu_util.append(g)
-            temp.append(t)
-            cpu_freq.append(cf)
-        ram_usage, cpu_util, temp = np.array(ram_usage), np.array(cpu_util),  np.array(temp)
-        
-        stats = {
-            "cpu": cpu_util,
-            "memory": ram_usage,
-            "temperature": temp,
-            "gpu_util": gpu_util,
-            "cpu_freq": cpu_freq
-        }
-        return stats
-
     def get_pred(self, outputs):
-        return np.array(outputs).argmax()
+        with self.timer.span("postprocess"):
+            return outputs[0].argmax(axis=1)
         
\ No newline at end of file
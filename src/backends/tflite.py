@@ -1,18 +1,36 @@
+import os
 import numpy as np
-import threading
-import time
-from queue import Queue
 
 import utils
+import hardware
 from backends.backend import Backend
+from preprocessing import quantize
 
 
 class TfliteBackend(Backend):
-    def __init__(self, name, device="tpu"):
-        super(TfliteBackend, self).__init__(name)
+    input_layout = "NHWC"
+
+    def __init__(self, name, device="tpu", batch_size=1, num_threads=None, delegate=None,
+                 delegate_options=None, default_delegates=True, cpus=None):
+        """Initialize.
+        Args:
+            num_threads (int): interpreter threads on cpu, tflite's default if None
+            delegate (str): path of an external delegate library to load
+            delegate_options (dict): options passed to the external delegate
+            default_delegates (bool): apply the delegates tflite applies by
+            default, i.e. XNNPACK for float models
+            cpus (str): cores the interpreter threads run on, "big", "little",
+            "all" or a list of core ids, see `hardware.resolve_cpus`
+        """
+        super(TfliteBackend, self).__init__(name, batch_size=batch_size)
         self.precision = "int8"
         self.accelerator = "Edge TPU" if device=="tpu" else ""
         self.device = device
+        self.num_threads = num_threads
+        self.delegate = delegate
+        self.delegate_options = delegate_options or {}
+        self.default_delegates = default_delegates
+        self.cpus = cpus
         if self.device == "tpu":
             from pycoral.adapters import common, classify
             from pycoral.utils.edgetpu import make_interpreter
@@ -22,8 +40,29 @@ class TfliteBackend(Backend):
         else:
             import tflite_runtime
             import tflite_runtime.interpreter as tflite
-            self.make_interpreter = tflite.Interpreter
+            self.tflite = tflite
+            self.make_interpreter = self._make_cpu_interpreter
     
+    @classmethod
+    def from_args(cls, args):
+        if args.device == None:
+            raise ValueError("Please mention the device to run tflite backend --device tpu/cpu")
+        delegate_options = dict(option.split("=", 1) for option in args.tflite_delegate_options.split(";") if option) \
+            if args.tflite_delegate_options else None
+        return cls(
+            name="tflite", device=args.device, batch_size=args.batch_size, num_threads=args.tflite_threads,
+            delegate=args.tflite_delegate, delegate_options=delegate_options,
+            default_delegates=not args.tflite_no_default_delegates, cpus=args.cpu_affinity)
+
+    def _make_cpu_interpreter(self, model_path):
+        kwargs = {"num_threads": self.num_threads}
+        if self.delegate:
+            kwargs["experimental_delegates"] = [self.tflite.load_delegate(self.delegate, self.delegate_options)]
+        if not self.default_delegates:
+            kwargs["experimental_op_resolver_type"] = \
+                self.tflite.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        return self.tflite.Interpreter(model_path=model_path, **kwargs)
+
     def get_accelerator(self):
         return self.accelerator
 
@@ -50,88 +89,102 @@ class TfliteBackend(Backend):
 
         if model_path is None or not os.path.exists(model_path):
             model_path = utils.download_model(model_name, self.name, device=self.device)
+        if self.cpus is not None:
+            # before the interpreter exists, its thread pool inherits the affinity
+            hardware.pin_cpus(hardware.resolve_cpus(self.cpus))
         self.interpreter = self.make_interpreter(model_path)
         
         self.interpreter.allocate_tensors()
-
-        self.input_details = self.interpreter.get_input_details()[0]
-        self.output_details = self.interpreter.get_output_details()[0]
+        self._bind_tensors()
         
         params = self.input_details['quantization_parameters']
         self.input_scale = params['scales']
         self.input_zero_point = params['zero_points']
+        self.input_dtype = np.dtype(self.input_details['dtype'])
+
+    def _bind_tensors(self):
+        """Looks up the tensors, again after every `allocate_tensors`.
+        """
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        # callables returning views of the tensor buffers; a view must not
+        # be alive while the interpreter runs, so they are used and dropped
+        self.input_tensor = self.interpreter.tensor(self.input_details['index'])
+        self.output_tensor = self.interpreter.tensor(self.output_details['index'])
+        # outputs are read into this buffer instead of a new array per call,
+        # they stay valid until the next call
+        self.output_buffer = np.empty(self.output_details['shape'], dtype=self.output_details['dtype'])
+
+    def input_quantization(self):
+        if self.input_dtype.kind not in "iu" or len(self.input_scale) == 0:
+            return None
+        return {
+            "scale": [float(scale) for scale in self.input_scale],
+            "zero_point": [int(zero_point) for zero_point in self.input_zero_point],
+            "dtype": self.input_dtype.name,
+        }
     
+    def _resize_input(self, batch):
+        if self.input_details['shape'][0] == batch:
+            return
+        shape = list(self.input_details['shape'])
+        shape[0] = batch
+        self.interpreter.resize_tensor_input(self.input_details['index'], shape)
+        self.interpreter.allocate_tensors()
+        self._bind_tensors()
+
     def __call__(self, inputs):
-        inputs = inputs / self.input_scale + self.input_zero_point
-        inputs = inputs.astype(np.uint8)
-        if self.device == "tpu":        
-            self.common.set_input(self.interpreter, inputs)
-        else:
-            inputs = np.expand_dims(inputs, axis=0)
-            self.interpreter.set_tensor(self.input_details['index'], inputs)
-    
-        start = time.time()
-        self.interpreter.invoke()
-        end = time.time()
+        self.timer.begin()
+        inputs = self._as_batch(inputs)
+        if inputs.dtype != self.input_dtype:
+            # float inputs, e.g. warmup data; datasets preprocessed for this
+            # model are already quantized
+            with self.timer.span("quantize"):
+                if self.input_dtype.kind in "iu":
+                    inputs = quantize(inputs, self.input_scale, self.input_zero_point, self.input_dtype)
+                else:
+                    inputs = inputs.astype(self.input_dtype)
         if self.device == "tpu":
-            classes = self.classify.get_classes(self.interpreter, 1, 0.0)
-        else:
-            classes = self.interpreter.get_tensor(self.output_details['index'])
-        return classes, end - start
+            # edgetpu models are compiled for a single sample, invoke once per sample
+            classes = []
+            for sample in inputs:
+                with self.timer.span("copy_in"):
+                    # written straight into the input tensor, the view is
+                    # released before invoke as the interpreter requires
+                    np.copyto(self.input_tensor()[0], sample)
+                with self.timer.span("invoke"):
+                    self.interpreter.invoke()
+                with self.timer.span("copy_out"):
+                    classes.append(self.classify.get_classes(self.interpreter, 1, 0.0))
+            return classes, self.timer.call_time()
+
+        with self.timer.span("copy_in"):
+            self._resize_input(len(inputs))
+            np.copyto(self.input_tensor(), inputs)
+        with self.timer.span("invoke"):
+            self.interpreter.invoke()
+        with self.timer.span("copy_out"):
+            np.copyto(self.output_buffer, self.output_tensor())
+        return self.output_buffer, self.timer.call_time()
     
     def warmup(self, inputs, warmup_steps=100):
         for step in range(warmup_steps):
             self(inputs)
     
-    def capture_stats(self):
-        self.stop_event = threading.Event()
-        self.output_queue = Queue()
-        if self.device=="tpu":
-            self.psutil_thread = threading.Thread(
-                target=utils.get_coral_stats, args=(self.output_queue, self.stop_event), daemon=True
-            )
-        else:
-            self.psutil_thread = threading.Thread(
-                target=utils.get_stats_rockpi, args=(self.output_queue, self.stop_event), daemon=True
-            )
-        self.psutil_thread.start()
-    
-    def get_avg_stats(self):
-        ram_usage, cpu_util, temp, tpu_freq, cpu_freq = [], [], [], [], []
-        
-        while not self.output_queue.empty():
+    def get_pred(self, outputs):
+        with self.timer.span("postprocess"):
             if self.device == "tpu":
-                c,r,t, tf, cf = self.output_queue.get()
+                preds = np.array([classes[0].id for classes in outputs])
             else:
-                c,r,t, cf = self.output_queue.get()
-            ram_usage.append(r)
-            cpu_util.append(c)
-            temp.append(t)
-            if self.device == "tpu":
-                tpu_freq.append(tf)
-            cpu_freq.append(cf)
-        ram_usage, cpu_util, temp = np.array(ram_usage), np.array(cpu_util), np.array(temp)
-        
-        if self.device == "cpu":
-            tpu_freq = ""
-        stats = {
-            "cpu": cpu_util,
-            "memory": ram_usage,
-            "temperature": temp,
-            "tpu_freq": tpu_freq,
-            "cpu_freq": cpu_freq
-        }
-        return stats
-    
-    def get_pred(self, outputs):
-        if self.device == "tpu":
-            pred = outputs[0].id
-        else:
-            pred = np.argmax(np.array(outputs))
-        if self.model_name == "resnet50":
-            return pred
-        return pred - 1
+                outputs = np.asarray(outputs)
+                preds = outputs.reshape(len(outputs), -1).argmax(axis=1)
+            if self.model_name == "resnet50":
+                return preds
+            return preds - 1
     
     def destroy(self):
         del self.interpreter
+        if self.cpus is not None:
+            # the next backend of a sweep starts from the original affinity
+            hardware.unpin()
 
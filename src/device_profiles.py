@@ -0,0 +1,139 @@
+"""
+Declarative device profiles for board telemetry
+
+A profile in `config/device_profiles.json` maps a board model (as read from
+the device tree) to its power monitor bus, the telemetry backend to use and
+which thermal zones to report. The sysfs nodes themselves are discovered, so
+the sampler reads only nodes that exist and a new board needs a profile
+entry rather than new code. Every path is resolved under `sysfs_root` and
+`procfs_root`, which lets the whole module run against a fake tree.
+"""
+import os
+import re
+import json
+
+import metrics
+from telemetry import SysfsNode, NodeGroup, ProcStatCpu, ApexTpuFreq
+
+
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "device_profiles.json")
+
+
+def _numbered(paths, pattern):
+    """Sorts paths by the number in their last component matching `pattern`.
+    """
+    numbered = []
+    for path in paths:
+        match = re.fullmatch(pattern, os.path.basename(path))
+        if match:
+            numbered.append((int(match.group(1)), path))
+    return [path for _, path in sorted(numbered)]
+
+
+def _listdir(path):
+    try:
+        return [os.path.join(path, name) for name in os.listdir(path)]
+    except OSError:
+        return []
+
+
+def discover(sysfs_root="/sys", procfs_root="/proc"):
+    """Finds the telemetry nodes present on this machine.
+    Returns:
+        dict: paths of per-core `cpu_freq` nodes, `thermal_zones` (index ->
+        temp node), devfreq `gpu_freq` nodes, `apex` device directories with
+        all three trip points and the `cpu_stat` file, None if missing
+    """
+    cpu_dir = os.path.join(sysfs_root, "devices", "system", "cpu")
+    cpu_freq = [
+        os.path.join(path, "cpufreq", "scaling_cur_freq")
+        for path in _numbered(_listdir(cpu_dir), r"cpu(\d+)")
+        if os.path.exists(os.path.join(path, "cpufreq", "scaling_cur_freq"))
+    ]
+
+    thermal_zones = {}
+    for path in _numbered(_listdir(os.path.join(sysfs_root, "class", "thermal")), r"thermal_zone(\d+)"):
+        if os.path.exists(os.path.join(path, "temp")):
+            thermal_zones[int(os.path.basename(path)[len("thermal_zone"):])] = os.path.join(path, "temp")
+
+    gpu_freq = []
+    for path in sorted(_listdir(os.path.join(sysfs_root, "class", "devfreq"))):
+        name = os.path.basename(path).lower()
+        if ("gpu" in name or "mali" in name) and os.path.exists(os.path.join(path, "cur_freq")):
+            gpu_freq.append(os.path.join(path, "cur_freq"))
+
+    # ApexTpuFreq needs every trip point the driver throttles at
+    apex = [
+        path for path in _numbered(_listdir(os.path.join(sysfs_root, "class", "apex")), r"apex_(\d+)")
+        if all(os.path.exists(os.path.join(path, f"trip_point{i}_temp")) for i in range(3))
+    ]
+
+    cpu_stat = os.path.join(procfs_root, "stat")
+    if not os.path.exists(cpu_stat):
+        cpu_stat = None
+    return {
+        "cpu_freq": cpu_freq, "thermal_zones": thermal_zones, "gpu_freq": gpu_freq, "apex": apex,
+        "cpu_stat": cpu_stat,
+    }
+
+
+class DeviceProfile:
+    def __init__(self, name, power_bus=3, telemetry="sysfs", thermal_zones=None,
+                 tpu_thermal_zone=0, match=None):
+        self.name = name
+        self.power_bus = power_bus
+        self.telemetry = telemetry
+        self.thermal_zones = thermal_zones
+        self.tpu_thermal_zone = tpu_thermal_zone
+        self.match = match or []
+
+    def matches(self, model):
+        return model is not None and any(pattern in model for pattern in self.match)
+
+    def build_sources(self, sysfs_root="/sys", procfs_root="/proc"):
+        """Telemetry sources for `telemetry.TelemetrySampler`, built from the
+        discovered nodes this profile asks for.
+        """
+        nodes = discover(sysfs_root, procfs_root)
+        sources = {"memory": lambda: metrics.get_memory_usage()[0]}
+        if nodes["cpu_stat"] is not None:
+            sources["cpu"] = ProcStatCpu(nodes["cpu_stat"])
+
+        zones = nodes["thermal_zones"]
+        wanted = list(zones) if self.thermal_zones is None else [z for z in self.thermal_zones if z in zones]
+        if wanted:
+            sources["temperature"] = NodeGroup(
+                [SysfsNode(zones[zone], scale=1000.0) for zone in wanted],
+                reduce=lambda values: sum(values) / len(values))
+
+        if nodes["apex"] and self.tpu_thermal_zone in zones:
+            sources["tpu_freq"] = ApexTpuFreq(zones[self.tpu_thermal_zone], nodes["apex"][0])
+        if nodes["gpu_freq"]:
+            # devfreq reports Hz, cpufreq kHz, both are stored in MHz
+            sources["gpu_freq"] = NodeGroup([SysfsNode(path, scale=1e6) for path in nodes["gpu_freq"]])
+        if nodes["cpu_freq"]:
+            sources["cpu_freq"] = NodeGroup([SysfsNode(path, scale=1000.0) for path in nodes["cpu_freq"]])
+        return sources
+
+
+def read_device_model(procfs_root="/proc"):
+    try:
+        with open(os.path.join(procfs_root, "device-tree", "model"), "r") as f:
+            return f.read().strip('\x00').strip()
+    except OSError:
+        return None
+
+
+def load_profile(model=None, path=PROFILES_PATH, procfs_root="/proc"):
+    """Profile of the board `model`, read from the device tree under
+    `procfs_root` when not given. Falls back to the generic default profile.
+    """
+    if model is None:
+        model = read_device_model(procfs_root)
+    with open(path, 'r') as f:
+        config = json.load(f)
+    for profile in config["profiles"]:
+        profile = DeviceProfile(**profile)
+        if profile.matches(model):
+            return profile
+    return DeviceProfile(**config["default"])
@@ -0,0 +1,142 @@
+"""
+Time-aligned power and energy accounting
+
+The PAC1931 power server returns its vbus/ibus samples for the whole span
+between `power-start` and `power-stop`. `EnergyMeter` timestamps those samples
+on `timing.clock_ns`, records named phases (idle baseline, inference, ...) on
+the same clock and integrates power per phase, so the idle time around the
+measurement does not count as inference power.
+"""
+from contextlib import contextmanager
+
+import numpy as np
+import requests
+
+import metrics
+import utils
+from timing import clock_ns
+
+
+def timestamp_samples(count, start_ns, stop_ns, response=None):
+    """Timestamps of `count` power samples taken between `start_ns` and `stop_ns`.
+    Uses the `timestamps` (seconds since power-start) of the response when the
+    server provides them, otherwise assumes evenly spaced samples.
+    """
+    if response is not None and response.get("timestamps") is not None:
+        offsets = np.asarray(response["timestamps"][:count], dtype=np.float64)
+        return start_ns + (offsets * 1e9).astype(np.int64)
+    return np.linspace(start_ns, stop_ns, count).astype(np.int64)
+
+
+class EnergyMeter:
+    """Power measurement of one run.
+    Args:
+        bus_id: PAC1931 bus the board is connected to
+        server_url: base url of the power server
+        power_scale: factor turning `utils.parse_power_response` values into watts
+        timeout: seconds to wait for the power server
+
+    An unreachable power server does not stop the run, the meter then has no
+    samples and every power figure is None.
+    """
+    def __init__(self, bus_id, server_url=metrics.POWER_SERVER_URL, power_scale=1e-3,
+                 timeout=metrics.POWER_TIMEOUT):
+        self.bus_id = bus_id
+        self.server_url = server_url
+        self.power_scale = power_scale
+        self.timeout = timeout
+        self.started = False
+        self.phases = {}
+        self.power = np.array([])
+        self.timestamps = np.array([], dtype=np.int64)
+
+    def start(self):
+        before = clock_ns()
+        try:
+            metrics.start_PAC1931(self.server_url, timeout=self.timeout)
+            self.started = True
+        except (requests.RequestException, ValueError) as e:
+            print(f"[WARN] Could not start the power measurement, power is not reported: {e}")
+        # the server starts sampling somewhere during the request
+        self.start_ns = (before + clock_ns()) // 2
+
+    def stop(self):
+        before = clock_ns()
+        response = None
+        if self.started:
+            try:
+                response = metrics.stop_PAC1931(self.server_url, timeout=self.timeout)
+            except (requests.RequestException, ValueError) as e:
+                print(f"[WARN] Could not stop the power measurement, power is not reported: {e}")
+        self.stop_ns = (before + clock_ns()) // 2
+        if response is not None:
+            self.power = utils.parse_power_response(response, self.bus_id)
+            self.timestamps = timestamp_samples(len(self.power), self.start_ns, self.stop_ns, response)
+        return self.power
+
+    @contextmanager
+    def phase(self, name):
+        start = clock_ns()
+        try:
+            yield
+        finally:
+            self.phases[name] = (start, clock_ns())
+
+    def phase_samples(self, name):
+        """Raw power samples taken during a phase.
+        """
+        start, end = self.phases[name]
+        return self.power[(self.timestamps >= start) & (self.timestamps <= end)]
+
+    def phase_power(self, name):
+        """Mean power in watts during a phase. Phases shorter than the sample
+        interval are interpolated at their midpoint. None when the meter got
+        no samples, e.g. with the power server unreachable.
+        """
+        if len(self.power) == 0:
+            return None
+        samples = self.phase_samples(name)
+        if len(samples):
+            return float(samples.mean() * self.power_scale)
+        start, end = self.phases[name]
+        return float(np.interp((start + end) / 2, self.timestamps, self.power) * self.power_scale)
+
+    def report(self, inferences, phase="inference", baseline_phase="idle"):
+        """Energy of every phase, and per-inference figures for `phase` with
+        the idle baseline power measured in `baseline_phase` subtracted.
+        Power and energy figures are None without power samples.
+        """
+        report = {"phases": {}}
+        for name, (start, end) in self.phases.items():
+            duration = (end - start) / 1e9
+            power = self.phase_power(name)
+            report["phases"][name] = {
+                "duration_s": round(duration, 3),
+                "power_w": round(power, 4) if power is not None else None,
+                "energy_j": round(power * duration, 4) if power is not None else None,
+            }
+        if phase not in self.phases or not inferences:
+            return report
+        if len(self.power) == 0:
+            report.update({
+                "idle_power_w": None,
+                "inference_power_w": None,
+                "energy_per_inference_j": None,
+                "dynamic_energy_per_inference_j": None,
+                "inferences_per_joule": None,
+            })
+            return report
+
+        duration = (self.phases[phase][1] - self.phases[phase][0]) / 1e9
+        power = self.phase_power(phase)
+        baseline = self.phase_power(baseline_phase) if baseline_phase in self.phases else 0.0
+        energy = power * duration
+        dynamic = (power - baseline) * duration
+        report.update({
+            "idle_power_w": round(baseline, 4),
+            "inference_power_w": round(power, 4),
+            "energy_per_inference_j": round(energy / inferences, 6),
+            "dynamic_energy_per_inference_j": round(dynamic / inferences, 6),
+            "inferences_per_joule": round(inferences / energy, 3) if energy > 0 else None,
+        })
+        return report
@@ -0,0 +1,203 @@
+"""
+Cached hardware fingerprint
+
+Device model, cpu, core frequencies, GPU name and driver/runtime versions
+are collected once and stored in `~/.cache/mlbench/hardware.json` keyed by
+the machine id and the boot id, so later runs on the same boot read them
+back instead of probing the hardware again. A reboot (e.g. after a driver
+update) or `refresh=True` collects them anew.
+"""
+import os
+import json
+import shutil
+import subprocess
+
+import utils
+import device_profiles
+
+
+CACHE_PATH = os.path.expanduser(os.path.join("~", ".cache", "mlbench", "hardware.json"))
+
+_fingerprint = None
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip('\x00').strip()
+    except OSError:
+        return None
+
+
+def machine_id(etc_root="/etc"):
+    return _read(os.path.join(etc_root, "machine-id")) or _read("/var/lib/dbus/machine-id")
+
+
+def boot_id(procfs_root="/proc"):
+    return _read(os.path.join(procfs_root, "sys", "kernel", "random", "boot_id"))
+
+
+def core_frequencies(sysfs_root="/sys"):
+    """Min and max frequency of every core in MHz.
+    """
+    cores = []
+    cpu_dir = os.path.join(sysfs_root, "devices", "system", "cpu")
+    for index in range(os.cpu_count() or 0):
+        cpufreq = os.path.join(cpu_dir, f"cpu{index}", "cpufreq")
+        low, high = _read(os.path.join(cpufreq, "cpuinfo_min_freq")), _read(os.path.join(cpufreq, "cpuinfo_max_freq"))
+        if low is None or high is None:
+            continue
+        cores.append({"core": index, "min_mhz": int(low) / 1000, "max_mhz": int(high) / 1000})
+    return cores
+
+
+def cpu_clusters(sysfs_root="/sys"):
+    """Cores grouped by their maximum frequency, slowest cluster first, e.g.
+    [[0, 1, 2, 3], [4, 5]] for the Cortex-A53/A72 clusters of an RK3399.
+    """
+    clusters = {}
+    for core in core_frequencies(sysfs_root):
+        clusters.setdefault(core["max_mhz"], []).append(core["core"])
+    if not clusters:
+        return [list(range(os.cpu_count() or 1))]
+    return [clusters[freq] for freq in sorted(clusters)]
+
+
+def resolve_cpus(spec, sysfs_root="/sys"):
+    """Cores selected by `spec`: "big" or "little" for the fastest or slowest
+    cluster, "all", or a comma separated list of core ids.
+    """
+    clusters = cpu_clusters(sysfs_root)
+    if spec == "big":
+        return clusters[-1]
+    if spec == "little":
+        return clusters[0]
+    if spec == "all":
+        return sorted(core for cluster in clusters for core in cluster)
+    return [int(core) for core in spec.split(",")]
+
+
+_unpinned_cpus = None
+
+
+def pin_cpus(cpus):
+    """Restricts the calling thread, and the threads and processes it starts
+    from now on, to `cpus`. Thread pools of inference frameworks inherit the
+    affinity of the thread creating them.
+    """
+    global _unpinned_cpus
+    if _unpinned_cpus is None:
+        _unpinned_cpus = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+
+
+def unpin():
+    """Restores the affinity from before `pin_cpus`, e.g. in preprocessing
+    workers forked from a pinned process.
+    """
+    if _unpinned_cpus is not None:
+        os.sched_setaffinity(0, _unpinned_cpus)
+
+
+def cuda_runtime_version(cuda_root="/usr/local/cuda"):
+    text = _read(os.path.join(cuda_root, "version.json"))
+    if text:
+        try:
+            return json.loads(text)["cuda"]["version"]
+        except (ValueError, KeyError):
+            pass
+    text = _read(os.path.join(cuda_root, "version.txt"))
+    return text.split()[-1] if text else None
+
+
+def query_gpu():
+    """GPU name and driver version, from pycuda when installed, else from
+    nvidia-smi, else from a deviceQuery binary built earlier.
+    Returns:
+        dict: `name`, `driver_version` and `runtime_version`, None where unknown
+    """
+    gpu = {"name": None, "driver_version": None, "runtime_version": cuda_runtime_version()}
+    try:
+        import pycuda.driver as cuda
+        cuda.init()
+        if cuda.Device.count():
+            gpu["name"] = cuda.Device(0).name()
+            version = cuda.get_driver_version()
+            gpu["driver_version"] = f"{version // 1000}.{version % 1000 // 10}"
+            return gpu
+    except Exception:
+        pass
+
+    if shutil.which("nvidia-smi"):
+        try:
+            result = subprocess.run(
+                ["nvidia-smi", "--query-gpu=name,driver_version", "--format=csv,noheader"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True, timeout=10)
+            name, driver_version = result.stdout.splitlines()[0].split(", ")
+            gpu.update({"name": name, "driver_version": driver_version})
+            return gpu
+        except (subprocess.SubprocessError, OSError, ValueError, IndexError):
+            pass
+
+    device_query = "/usr/local/cuda/samples/1_Utilities/deviceQuery/deviceQuery"
+    if os.access(device_query, os.X_OK):
+        try:
+            result = subprocess.run(
+                [device_query], stdout=subprocess.PIPE, universal_newlines=True, check=True, timeout=30)
+            for line in result.stdout.splitlines():
+                if "Device 0:" in line:
+                    gpu["name"] = line.split(": ")[1].strip('"')
+                elif "CUDA Driver Version / Runtime Version" in line:
+                    gpu["driver_version"], gpu["runtime_version"] = line.split()[-3], line.split()[-1]
+        except (subprocess.SubprocessError, OSError):
+            pass
+    return gpu
+
+
+def collect():
+    """Probes the hardware, without using the cache.
+    """
+    return {
+        # None on hosts without a device tree, e.g. x86
+        "device_model": device_profiles.read_device_model(),
+        "cpu": utils.get_cpu(),
+        "cpu_count": os.cpu_count(),
+        "core_frequencies": core_frequencies(),
+        "gpu": query_gpu(),
+    }
+
+
+def fingerprint(refresh=False, cache_path=CACHE_PATH):
+    """Hardware fingerprint of this machine, cached per process and on disk.
+    Returns:
+        dict: see `collect`, plus the `machine_id` and `boot_id` it is valid for
+    """
+    global _fingerprint
+    key = {"machine_id": machine_id(), "boot_id": boot_id()}
+    if not refresh and _fingerprint is not None:
+        return _fingerprint
+
+    if not refresh and None not in key.values():
+        try:
+            with open(cache_path, 'r') as f:
+                cached = json.load(f)
+            if all(cached.get(name) == value for name, value in key.items()):
+                _fingerprint = cached
+                return _fingerprint
+        except (OSError, ValueError):
+            pass
+
+    _fingerprint = dict(collect(), **key)
+    if None not in key.values():
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path + ".tmp", 'w') as f:
+                json.dump(_fingerprint, f, indent=2)
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError as e:
+            print(f"[WARN] Could not cache the hardware fingerprint: {e}")
+    return _fingerprint
+
+
+if __name__ == '__main__':
+    print(json.dumps(fingerprint(refresh=True), indent=2))
@@ -0,0 +1,109 @@
+"""
+Latency statistics: percentiles, jitter, warm-up drift and a compact
+HDR-style histogram
+"""
+import numpy as np
+
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def _percentile_key(q):
+    return f"p{q:g}".replace(".", "_")
+
+
+def summarize(latencies, window_fraction=0.1):
+    """Summary of per-inference latencies given in seconds, reported in ms.
+    Args:
+        latencies: sequence of latencies in seconds, in execution order
+        window_fraction: share of the run compared at its start and end
+        to compute the warm-up drift
+    Returns:
+        dict: count, mean, std, min, max, percentiles, jitter (mean absolute
+        difference of consecutive latencies) and warm-up drift in percent
+    """
+    lat = np.asarray(latencies, dtype=np.float64) * 1000
+    if lat.size == 0:
+        return {"count": 0}
+
+    summary = {
+        "count": int(lat.size),
+        "mean": float(lat.mean()),
+        "std": float(lat.std()),
+        "min": float(lat.min()),
+        "max": float(lat.max()),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(lat, PERCENTILES)):
+        summary[_percentile_key(q)] = float(value)
+    summary["jitter"] = float(np.abs(np.diff(lat)).mean()) if lat.size > 1 else 0.0
+
+    window = max(1, int(lat.size * window_fraction))
+    head, tail = lat[:window].mean(), lat[-window:].mean()
+    summary["warmup_drift_pct"] = float((head - tail) / tail * 100) if tail > 0 else 0.0
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in summary.items()}
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds.
+
+    Values below 2**precision_bits get one bucket each; above that every
+    power of two is split into 2**(precision_bits - 1) buckets, so the
+    relative error stays below 2**-(precision_bits - 1) whatever the range.
+    Memory depends on the value range only, not on the number of samples.
+    """
+    def __init__(self, precision_bits=7):
+        self.precision_bits = precision_bits
+        self.counts = np.zeros(1 << precision_bits, dtype=np.int64)
+        self.total = 0
+        self.max_us = 0
+
+    def _index(self, values):
+        p = self.precision_bits
+        half = 1 << (p - 1)
+        # frexp exponent is the bit length for positive integers below 2**53
+        bit_length = np.frexp(np.maximum(values, 1))[1].astype(np.int64)
+        shift = np.maximum(bit_length - p, 0)
+        mantissa = values >> shift
+        return np.where(shift == 0, values, (1 << p) + (shift - 1) * half + mantissa - half)
+
+    def _value(self, index):
+        p = self.precision_bits
+        half = 1 << (p - 1)
+        index = np.asarray(index, dtype=np.int64)
+        k = np.maximum(index - (1 << p), 0)
+        shift = k // half + 1
+        low = (k % half + half) << shift
+        return np.where(index < (1 << p), index, low + (1 << (shift - 1)))
+
+    def record(self, latencies):
+        """Adds latencies given in seconds.
+        """
+        values = np.round(np.asarray(latencies, dtype=np.float64) * 1e6).astype(np.int64)
+        if values.size == 0:
+            return
+        counts = np.bincount(self._index(np.maximum(values, 0)))
+        if counts.size > self.counts.size:
+            self.counts = np.pad(self.counts, (0, counts.size - self.counts.size))
+        self.counts[:counts.size] += counts
+        self.total += int(values.size)
+        self.max_us = max(self.max_us, int(values.max()))
+
+    def percentile(self, q):
+        """Approximate q-th percentile in milliseconds.
+        """
+        if self.total == 0:
+            return 0.0
+        rank = int(np.ceil(q / 100 * self.total))
+        index = int(np.searchsorted(np.cumsum(self.counts), max(rank, 1)))
+        return float(min(self._value(index), self.max_us)) / 1000
+
+    def to_dict(self):
+        """Sparse representation: only non-empty buckets are kept.
+        """
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "unit": "us",
+            "precision_bits": self.precision_bits,
+            "buckets": self._value(nonzero).tolist(),
+            "counts": self.counts[nonzero].tolist(),
+        }
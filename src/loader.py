@@ -0,0 +1,100 @@
+"""
+Background prefetching data loader
+"""
+import queue
+import threading
+import multiprocessing
+
+import numpy as np
+
+from tensor_store import TensorStore
+
+
+_END = "__end__"
+
+
+def _put(out_queue, item, stop_event):
+    """Blocks until `item` is queued or `stop_event` is set, so a consumer
+    that stopped early never leaves the producer blocked on a full queue.
+    Returns:
+        bool: whether the item was queued
+    """
+    while not stop_event.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    if hasattr(out_queue, "cancel_join_thread"):
+        # items nobody reads must not keep a producer process from exiting
+        out_queue.cancel_join_thread()
+    return False
+
+
+def _produce(dataset, batch_size, out_queue, stop_event):
+    try:
+        for image_ids, inputs, labels in dataset.batches(batch_size):
+            # np.array forces the memmap pages in here, off the consumer's path
+            if not _put(out_queue, (image_ids, np.array(inputs), labels), stop_event):
+                return
+        _put(out_queue, _END, stop_event)
+    except Exception as exception:
+        _put(out_queue, exception, stop_event)
+
+
+def _produce_from_store(path, limit, batch_size, out_queue, stop_event):
+    _produce(TensorStore(path, limit=limit), batch_size, out_queue, stop_event)
+
+
+class PrefetchLoader:
+    """Reads batches of a `tensor_store.TensorStore` ahead of the consumer.
+
+    A producer thread (or process) fills a bounded queue of `depth` batches
+    while the backend runs inference on the previous one, so disk reads
+    overlap with compute. A depth of 0 disables prefetching.
+
+    Every item is a tuple of (image ids, inputs with a leading batch axis,
+    labels); the last batch may be smaller than `batch_size`.
+    """
+    def __init__(self, dataset, depth=4, mode="thread", batch_size=1):
+        if mode not in ["thread", "process"]:
+            raise ValueError(f"Unknown prefetch mode {mode}, expected thread/process")
+        self.dataset = dataset
+        self.depth = depth
+        self.mode = mode
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return (len(self.dataset) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        if self.depth <= 0:
+            yield from self.dataset.batches(self.batch_size)
+            return
+
+        if self.mode == "thread":
+            out_queue = queue.Queue(maxsize=self.depth)
+            stop_event = threading.Event()
+            producer = threading.Thread(
+                target=_produce,
+                args=(self.dataset, self.batch_size, out_queue, stop_event), daemon=True)
+        else:
+            out_queue = multiprocessing.Queue(maxsize=self.depth)
+            stop_event = multiprocessing.Event()
+            producer = multiprocessing.Process(
+                target=_produce_from_store,
+                args=(self.dataset.path, len(self.dataset), self.batch_size, out_queue, stop_event),
+                daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = out_queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                if isinstance(item, str) and item == _END:
+                    break
+                yield item
+        finally:
+            stop_event.set()
+            producer.join(timeout=1)
@@ -1,116 +1,132 @@
 import argparse
-import utils
-from tqdm import tqdm
 import os
 import numpy as np
 import time
-import requests
 import metrics
+import backends
+import latency_stats
+import device_profiles
+from energy import EnergyMeter
+import tensor_store
+from preprocessing import PreprocessEngine, QuantizedPreprocess
+from preprocess_cache import PreprocessCache, cache_key
+from scenarios import SCENARIOS, make_scenario
+from results_sink import RESULTS_URL, ResultsSink, json_safe
+from run_data import write_run_data
 
 
-def main(args):
+def load_labels(imagenet):
+    labels = {}
+    with open(os.path.join(imagenet, 'val_map.txt'), "r") as f:
+        lines = f.readlines()
+        for line in lines:
+            p, l = line.split(' ')
+            labels[p.split('.')[0]] = int(l)
+    return labels
+
+
+def main(args, shared=None):
+    """Runs one benchmark configuration.
+    Args:
+        shared: dict reused across the runs of a sweep, caches the label
+        index, the image listing and the opened preprocessed datasets
+    Returns:
+        dict: the benchmark summary that is uploaded to the results server
+    """
     print(args)
+    if shared is None:
+        shared = {}
     os.makedirs(args.preprocessed_dir, exist_ok=True)
 
     backend = None
     data = None
-    if args.backend == "tensorrt":
-        from backends.tensorrt import TRTBackend
-        if args.model_path is not None:
-            precision = "fp16" if "fp16" in args.model_path else "fp32"
-        elif args.precision is not None:
-            precision = args.precision
+    if args.backend is not None:
+        backend = backends.load_backend_class(args.backend).from_args(args)
+        backend.preprocess_impl = args.preprocess_impl
+        if backend.input_layout == "NHWC":
+            data = np.ones((args.batch_size, args.input_size[0], args.input_size[1], 3), dtype=np.float32)
         else:
-            precision = "fp16"
-        backend = TRTBackend(name="tensorrt", precision=precision)
-        data = np.ones((1 * 3 * 224 * 224), dtype=np.float32)
-    
-    if args.backend == "tflite":
-        if args.device == None:
-            raise ValueError("Please mention the device to run tflite backend --device tpu/cpu")
-        from backends.tflite import TfliteBackend
-        backend = TfliteBackend(name="tflite", device=args.device)
-        data = np.ones((args.input_size[0], args.input_size[1], 3), dtype=np.float32)
-    
-    if args.backend == "ncnn":
-        from backends.ncnn import NCNNBackend
-        backend = NCNNBackend()
-        data = np.ones((1, 3, 224, 224), dtype=np.float32)
-    
-    if args.backend in ["onnx", "onnxruntime"]:
-        from backends.onnx_backend import ONNXBackend
-        backend = ONNXBackend(name="onnxruntime", device=args.device)
-        data = np.ones((1, 3, args.input_size[0], args.input_size[1]), dtype=np.float32)
-
-    
-    # preprocess and save np array
-    jpeg_files_list = os.listdir(args.imagenet)
-
-    preprocess_func = backend.get_preprocess_func(args.model_name)
-    
-    if args.count:
-        jpeg_files_list = jpeg_files_list[:args.count]
+            data = np.ones((args.batch_size, 3, args.input_size[0], args.input_size[1]), dtype=np.float32)
 
-    for filename in tqdm(jpeg_files_list, desc="Preprocessing", unit="image"):
-        if not filename.lower().endswith('.jpeg'):
-            continue
-        jpeg_path = os.path.join(args.imagenet, filename)
-        npy_path = os.path.join(args.preprocessed_dir, filename.replace("JPEG", "npy"))
-        if os.path.exists(npy_path):
-            continue
-        preprocessed = preprocess_func(jpeg_path, size=args.input_size)
-        np.save(npy_path, preprocessed)
-    
     # load val_map
-    labels = {}
-    with open(os.path.join(args.imagenet, 'val_map.txt'), "r") as f:
-        lines = f.readlines()
-        for line in lines:
-            p, l = line.split(' ')
-            labels[p.split('.')[0]] = int(l)
-    times = []
+    if shared.get("imagenet") != args.imagenet:
+        shared.clear()
+        shared["imagenet"] = args.imagenet
+        shared["labels"] = load_labels(args.imagenet)
+        shared["jpeg_files"] = sorted(f for f in os.listdir(args.imagenet) if f.lower().endswith('.jpeg'))
+        shared["stores"] = {}
+    labels = shared["labels"]
     accuracy = []
 
-    
-
     if backend is None:
         print("backend is none")
         return
-    
+
+    # preprocess into a packed tensor store
+    jpeg_files_list = shared["jpeg_files"]
+
+    # the model is loaded first, a quantized model input is folded into the dataset
     backend.load_backend(args.model_path, model_name=args.model_name)
+    preprocess_func = backend.get_preprocess_func(args.model_name)
+    quantization = backend.input_quantization() if args.quantize_dataset else None
+    if quantization is not None:
+        preprocess_func = QuantizedPreprocess(preprocess_func, **quantization)
+
+    if args.count:
+        jpeg_files_list = jpeg_files_list[:args.count]
+    image_ids = [filename.split('.')[0] for filename in jpeg_files_list]
+
+    engine = PreprocessEngine(
+        preprocess_func, size=args.input_size,
+        workers=args.preprocess_workers, chunksize=args.preprocess_chunksize)
+    jpeg_paths = [os.path.join(args.imagenet, filename) for filename in jpeg_files_list]
+    sample = engine.probe(jpeg_paths[0])
+    cache = PreprocessCache(
+        args.preprocessed_dir,
+        max_bytes=int(args.cache_max_gb * 1024**3) if args.cache_max_gb else None)
+    key = cache_key(
+        getattr(preprocess_func, "func", preprocess_func), args.input_size, sample.shape, sample.dtype,
+        source=args.imagenet, params={"quantization": quantization} if quantization else None, files=jpeg_paths)
+    variant = f"{args.backend}_{args.model_name}_" \
+        f"{tensor_store.store_name(preprocess_func, args.input_size, sample.dtype)}"
+    store_path = cache.entry_path(key, variant)
+    if (store_path, len(image_ids)) in shared["stores"]:
+        dataset = shared["stores"][(store_path, len(image_ids))]
+    else:
+        writer = tensor_store.TensorStoreWriter(
+            store_path, image_ids, [labels[i] for i in image_ids], sample.shape, sample.dtype)
+        engine.run(jpeg_paths, writer)
+        dataset = tensor_store.TensorStore(store_path, limit=len(image_ids))
+        shared["stores"][(store_path, len(image_ids))] = dataset
+    cache.evict(keep=[path for path, _ in shared["stores"]])
+
     backend.warmup(data)
+    backend.timer.reset()
 
+    device_profile = device_profiles.load_profile()
+    backend.device_profile = device_profile
+    backend.telemetry_hz = args.telemetry_hz
     backend.capture_stats()
 
-    npy_arrays = os.listdir(args.preprocessed_dir)
-    if args.count is not None:
-        npy_arrays = npy_arrays[:args.count]
+    def on_result(image_ids, gts, outputs):
+        preds = backend.get_pred(outputs)
+        accuracy.extend((preds == gts).astype(int).tolist())
+
+    scenario = make_scenario(args)
 
-    # start power measuring
-    response = metrics.start_PAC1931()
+    # start power measuring, with an idle window first to get the baseline
+    meter = EnergyMeter(device_profile.power_bus, server_url=args.power_server)
+    meter.start()
+    with meter.phase("idle"):
+        time.sleep(args.idle_seconds)
     print(f"start time---- {time.localtime()}")
-    for npy_arr in tqdm(npy_arrays,  desc="Running inference"):
-        inputs = np.load(os.path.join(args.preprocessed_dir, npy_arr))
-        outputs, infer_time = backend(inputs)
-        times.append(infer_time)
-        pred = backend.get_pred(outputs)
-        gt = labels[npy_arr.split('.')[0]]
-        if pred==gt:
-            accuracy.append(1)
-        else:
-            accuracy.append(0)
+    with meter.phase("inference"):
+        result = scenario.run(backend, dataset, on_result)
+    times, run_time = result["latencies"], result["run_time"]
     print(f"end time---- {time.localtime()}")
-    response = metrics.stop_PAC1931()
-
-    board_name = utils.get_device_model()
-    if board_name == "Freescale i.MX8MQ Phanbell":
-        bus_id = 1
-    elif board_name == "NVIDIA Jetson Nano 2GB Developer Kit":
-        bus_id = 2
-    else:
-        bus_id = 3
-
-    power = utils.parse_power_response(response, bus_id)
+    power = meter.stop()
+    energy_report = meter.report(len(accuracy))
+    print(f"Energy = {energy_report}")
 
     backend.stop_event.set()
     backend.destroy()
@@ -118,61 +134,117 @@ def main(args):
     np_acc = np.array(accuracy)
     np_lat = np.array(times)
     print(f"Accuracy = {np.count_nonzero(np_acc == 1)/len(np_acc)}")
-    print(f"Latency = {np.sum(np_lat)/len(np_lat)}") 
+    print(f"Latency = {np.sum(np_lat)/len(np_lat)} s per {scenario.latency_unit}")
+    latency_summary = latency_stats.summarize(np_lat)
+    latency_histogram = latency_stats.LatencyHistogram()
+    latency_histogram.record(np_lat)
+    print(f"Latency percentiles (ms) = p50 {latency_summary['p50']}, p90 {latency_summary['p90']}, "
+          f"p99 {latency_summary['p99']}, p99.9 {latency_summary['p99_9']}, max {latency_summary['max']}")
+    print(f"Throughput = {len(np_acc)/run_time} images/s")
+    print(f"Scenario {scenario.name} = {result['metrics']}")
       
     stats = backend.get_avg_stats()
 
     data_dict = {}
-    data_dict["system"] = utils.get_device_model()
-    data_dict["processor"] = utils.get_cpu()
+    hardware_info = backend.hardware_info()
+    data_dict["system"] = hardware_info["device_model"]
+    data_dict["processor"] = hardware_info["cpu"]
     data_dict["accelerator"] = backend.get_accelerator()
     data_dict["model_name"] = backend.model_name
     data_dict["framework"] = f"{args.backend}"
     data_dict["version"] = str(backend.version())
+    # latency and latency_stats are per scenario query, per batch in the
+    # offline scenario (latency_unit); latency_per_image spreads the time
+    # of every call over the images it processed
     data_dict["latency"] = round(float(np.sum(np_lat)/len(np_lat))*1000, 3)
+    data_dict["latency_unit"] = scenario.latency_unit
+    data_dict["latency_per_image"] = round(float(np.sum(np_lat)/len(np_acc))*1000, 3)
+    data_dict["batch_size"] = args.batch_size
+    data_dict["scenario"] = scenario.name
+    data_dict["scenario_metrics"] = result["metrics"]
+    data_dict["throughput"] = round(float(len(np_acc)/run_time), 3)
+    data_dict["latency_stats"] = latency_summary
+    data_dict["span_latency"] = backend.timer.summary()
     data_dict["precision"] = backend.precision
+    if hasattr(backend, "get_stage_times") and backend.get_stage_times():
+        data_dict["stage_latency"] = backend.get_stage_times()
     data_dict["accuracy"] = round(float(np.count_nonzero(np_acc == 1)/len(np_acc))*100, 3)
-    data_dict["cpu"] = float(round(np.average(stats["cpu"]), 2)) if "cpu" in stats else ""
-    data_dict["memory"] = float(round(np.average(stats["memory"]), 2)) if "memory" in stats else ""
-    data_dict["power"] = float(round(np.average(power), 2)) if len(power) else ""
-    data_dict["temperature"] = float(round(np.average(stats["temperature"]), 2)) if "temperature" in stats else ""
+    data_dict["cpu"] = float(round(np.nanmean(stats["cpu"]), 2)) if "cpu" in stats else ""
+    data_dict["memory"] = float(round(np.nanmean(stats["memory"]), 2)) if "memory" in stats else ""
+    inference_power = meter.phase_samples("inference")
+    data_dict["power"] = float(round(np.average(inference_power), 2)) if len(inference_power) else None
+    data_dict["energy"] = energy_report
+    data_dict["temperature"] = float(round(np.nanmean(stats["temperature"]), 2)) if "temperature" in stats else ""
+    data_dict["hardware"] = hardware_info
+    data_dict = json_safe(data_dict)
     print(data_dict)
 
-    response = post(data_dict, url="http://transcription.kurg.org:27017/bench/insert")
-    
-    # Write the dictionary to the JSON file
+    # Write the dictionaries to the JSON files before anything is uploaded
     import json
     if not os.path.exists(os.path.join(args.results_dir, args.model_name)):
         os.makedirs(os.path.join(args.results_dir, args.model_name), exist_ok=True)
     with open(os.path.join(args.results_dir, args.model_name, f"{backend.precision}_results.json"), 'w') as json_file:
         json.dump(data_dict, json_file)
+    sink = ResultsSink(
+        args.results_dir, base_url=args.results_url, upload=not args.no_upload,
+        batch_path=args.upload_batch_path, timeout=args.upload_timeout)
+    benchmark = sink.put("benchmark", data_dict)
+    benchmark_summary = data_dict
 
-    # Send detailed sensors to the db
+    # Send detailed sensors to the db, the benchmark_id is filled in from the benchmark record
     data_dict = {}
-    data_dict["benchmark_id"] = response["benchmark_id"]
-    data_dict["cpu_usage"] = stats["cpu"].tolist()
-    data_dict["cpu_freq"] = stats["cpu_freq"]
-    data_dict["temperature"] = stats["temperature"].tolist()
-    data_dict["memory"] = stats["memory"].tolist()
+    data_dict["cpu_usage"] = stats["cpu"].tolist() if "cpu" in stats.keys() else ""
+    data_dict["cpu_freq"] = stats["cpu_freq"].tolist() if "cpu_freq" in stats.keys() else ""
+    data_dict["temperature"] = stats["temperature"].tolist() if "temperature" in stats.keys() else ""
+    data_dict["memory"] = stats["memory"].tolist() if "memory" in stats.keys() else ""
     data_dict["power"] = power.tolist()
-    data_dict["tpu_freq"] = stats["tpu_freq"] if "tpu_freq" in stats.keys() else ""
-    data_dict["gpu_freq"] = stats["gpu_freq"] if "gpu_freq" in stats.keys() else ""
-    data_dict["gpu_util"] = stats["gpu_util"] if "gpu_util" in stats.keys() else ""
+    data_dict["power_timestamps"] = meter.timestamps.tolist()
+    data_dict["phases"] = {name: list(window) for name, window in meter.phases.items()}
+    data_dict["tpu_freq"] = stats["tpu_freq"].tolist() if "tpu_freq" in stats.keys() else ""
+    data_dict["gpu_freq"] = stats["gpu_freq"].tolist() if "gpu_freq" in stats.keys() else ""
+    data_dict["gpu_util"] = stats["gpu_util"].tolist() if "gpu_util" in stats.keys() else ""
+    data_dict["latency_stats"] = latency_summary
+    data_dict["latency_unit"] = scenario.latency_unit
+    data_dict["latency_histogram"] = latency_histogram.to_dict()
+    # samples a sensor missed are NaN in the telemetry columns
+    data_dict = json_safe(data_dict)
 
-    response = post(data_dict, url="http://transcription.kurg.org:27017/bench/insert_metric")
-    with open(os.path.join(args.results_dir, args.model_name, f"{backend.precision}_results_stats.json"), 'w') as json_file:
-        json.dump(data_dict, json_file)
+    stats_path = os.path.join(args.results_dir, args.model_name, f"{backend.precision}_results_stats")
+    if args.metrics_format == "npz":
+        # time series go to the columnar file, the stats JSON keeps only the summaries
+        columns = {f"telemetry/{name}": column for name, column in stats.items()}
+        columns["power/value"] = power
+        columns["power/timestamp"] = meter.timestamps
+        columns["latency/seconds"] = np_lat
+        run_data = write_run_data(stats_path, columns, meta={"phases": data_dict["phases"]})
+        summary = {key: data_dict[key] for key in ["phases", "latency_stats", "latency_unit", "latency_histogram"]}
+        summary["run_data"] = os.path.basename(run_data)
+        with open(f"{stats_path}.json", 'w') as json_file:
+            json.dump(summary, json_file)
+    else:
+        with open(f"{stats_path}.json", 'w') as json_file:
+            json.dump(data_dict, json_file)
+    sink.put("metric", data_dict, parent=benchmark)
+    sink.close(timeout=args.upload_timeout * 3)
+    return benchmark_summary
 
 
-def post(data, url=None):
-    if url is None:
-        return
-    response = requests.post(url, json=data)
-    return response.json()
+class ListBackendsAction(argparse.Action):
+    def __init__(self, option_strings, dest, **kwargs):
+        super(ListBackendsAction, self).__init__(option_strings, dest, nargs=0, **kwargs)
 
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(backends.describe())
+        parser.exit()
 
-if __name__ == '__main__':
+
+def build_parser():
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--list-backends",
+        action=ListBackendsAction,
+        help="list the registered backends and whether their framework is installed, then exit"
+    )
     parser.add_argument(
         "--imagenet",
         default='/mnt/workspace/imagenet-2012/val',
@@ -183,7 +255,13 @@ if __name__ == '__main__':
         "--preprocessed-dir",
         default="/mnt/workspace/imagenet_preprocessed",
         type=str,
-        help="directory to store preprocessed np array"
+        help="directory to store the packed preprocessed datasets"
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        default=None,
+        type=float,
+        help="size limit of the preprocessing cache, least recently used datasets are evicted beyond it"
     )
     parser.add_argument(
         "--backend",
@@ -234,6 +312,254 @@ if __name__ == '__main__':
         type=str,
         help="tensorrt model precision"
     )
+    parser.add_argument(
+        "--batch-size",
+        default=1,
+        type=int,
+        help="number of images per inference call"
+    )
+    parser.add_argument(
+        "--telemetry-hz",
+        default=10.0,
+        type=float,
+        help="rate at which cpu, memory, temperature and frequencies are sampled"
+    )
+    parser.add_argument(
+        "--power-server",
+        default=metrics.POWER_SERVER_URL,
+        type=str,
+        help="base url of the PAC1931 power server, e.g. scripts/mock_power_server.py"
+    )
+    parser.add_argument(
+        "--idle-seconds",
+        default=5.0,
+        type=float,
+        help="idle window measured before inference as the power baseline"
+    )
+    parser.add_argument(
+        "--scenario",
+        default="single-stream",
+        choices=list(SCENARIOS),
+        help="load generator scenario, single-stream times one sample per query like runs without "
+             "scenarios did, offline runs batches of --batch-size back to back"
+    )
+    parser.add_argument(
+        "--target-latency-ms",
+        default=None,
+        type=float,
+        help="p90 latency bound of the single-stream scenario"
+    )
+    parser.add_argument(
+        "--server-qps",
+        default=None,
+        type=float,
+        help="mean rate of the poisson query arrivals in the server scenario"
+    )
+    parser.add_argument(
+        "--server-latency-ms",
+        default=100.0,
+        type=float,
+        help="p99 latency bound of the server scenario"
+    )
+    parser.add_argument(
+        "--multistream-samples",
+        default=8,
+        type=int,
+        help="samples per query in the multi-stream scenario"
+    )
+    parser.add_argument(
+        "--multistream-interval-ms",
+        default=50.0,
+        type=float,
+        help="query interval and p99 latency bound of the multi-stream scenario"
+    )
+    parser.add_argument(
+        "--tflite-threads",
+        default=None,
+        type=int,
+        help="number of tflite interpreter threads on cpu, tflite's default if unset"
+    )
+    parser.add_argument(
+        "--tflite-delegate",
+        default=None,
+        type=str,
+        help="path of an external tflite delegate library"
+    )
+    parser.add_argument(
+        "--tflite-delegate-options",
+        default=None,
+        type=str,
+        help="options of the external delegate as 'key=value;key=value'"
+    )
+    parser.add_argument(
+        "--tflite-no-default-delegates",
+        action="store_true",
+        help="run tflite without its default delegates, i.e. without XNNPACK"
+    )
+    parser.add_argument(
+        "--ncnn-threads",
+        default=None,
+        type=int,
+        help="number of ncnn threads, ncnn's default (the big cores) if unset"
+    )
+    parser.add_argument(
+        "--ncnn-fp16",
+        action="store_true",
+        help="ncnn fp16 storage, packing and arithmetic where the cpu supports them"
+    )
+    parser.add_argument(
+        "--ncnn-no-light-mode",
+        action="store_true",
+        help="keep intermediate ncnn blobs alive for the whole run"
+    )
+    parser.add_argument(
+        "--ncnn-no-winograd",
+        action="store_true",
+        help="disable ncnn winograd convolutions"
+    )
+    parser.add_argument(
+        "--ncnn-no-sgemm",
+        action="store_true",
+        help="disable ncnn sgemm convolutions"
+    )
+    parser.add_argument(
+        "--cpu-affinity",
+        default=None,
+        type=str,
+        help="cores the inference threads run on: big, little, all or a list of core ids such as 4,5"
+    )
+    parser.add_argument(
+        "--ort-providers",
+        default=None,
+        type=str,
+        help="comma separated onnxruntime execution providers in order of preference, the cpu provider is the last fallback"
+    )
+    parser.add_argument(
+        "--ort-graph-optimization",
+        default="all",
+        choices=["disable", "basic", "extended", "all"],
+        help="onnxruntime graph optimization level"
+    )
+    parser.add_argument(
+        "--ort-intra-threads",
+        default=0,
+        type=int,
+        help="onnxruntime intra-op threads, 0 lets onnxruntime decide"
+    )
+    parser.add_argument(
+        "--ort-inter-threads",
+        default=0,
+        type=int,
+        help="onnxruntime inter-op threads, only used by the parallel execution mode"
+    )
+    parser.add_argument(
+        "--ort-execution-mode",
+        default="sequential",
+        choices=["sequential", "parallel"],
+        help="onnxruntime execution mode"
+    )
+    parser.add_argument(
+        "--ort-optimized-cache",
+        default=os.path.expanduser(os.path.join("~", ".cache", "mlbench", "ort")),
+        type=str,
+        help="directory caching optimized onnx graphs for a faster session start"
+    )
+    parser.add_argument(
+        "--ort-no-optimized-cache",
+        action="store_true",
+        help="optimize the onnx graph on every session start"
+    )
+    parser.add_argument(
+        "--ort-no-io-binding",
+        action="store_true",
+        help="run onnxruntime with an input dict instead of preallocated bound buffers"
+    )
+    parser.add_argument(
+        "--ort-profile",
+        default=None,
+        type=str,
+        help="write an onnxruntime profile to this directory"
+    )
+    parser.add_argument(
+        "--trt-streams",
+        default=1,
+        type=int,
+        help="number of cuda streams keeping tensorrt batches in flight"
+    )
+    parser.add_argument(
+        "--trt-profile-copies",
+        action="store_true",
+        help="time tensorrt h2d copy, compute and d2h copy separately with cuda events"
+    )
+    parser.add_argument(
+        "--preprocess-workers",
+        default=None,
+        type=int,
+        help="number of preprocessing worker processes, defaults to the cpu count"
+    )
+    parser.add_argument(
+        "--preprocess-impl",
+        default="numpy",
+        choices=["numpy", "torchvision"],
+        help="implementation of the torchvision-style preprocessing, numpy needs neither torch nor PIL"
+    )
+    parser.add_argument(
+        "--no-quantize-dataset",
+        dest="quantize_dataset",
+        action="store_false",
+        help="keep the preprocessed dataset in float for models with quantized inputs, quantize on every call"
+    )
+    parser.add_argument(
+        "--preprocess-chunksize",
+        default=16,
+        type=int,
+        help="number of images handed to a preprocessing worker at once"
+    )
+    parser.add_argument(
+        "--prefetch-depth",
+        default=4,
+        type=int,
+        help="number of samples loaded ahead of inference, 0 disables prefetching"
+    )
+    parser.add_argument(
+        "--prefetch-mode",
+        default="thread",
+        choices=["thread", "process"],
+        help="run the prefetching producer in a thread or a separate process"
+    )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--metrics-format",
+        default="json",
+        choices=["json", "npz"],
+        help="format of the detailed per-run metrics, npz writes compressed columns readable with run_data.RunData"
+    )
+    parser.add_argument(
+        "--results-url",
+        default=RESULTS_URL,
+        type=str,
+        help="results server the benchmark and its metrics are uploaded to"
+    )
+    parser.add_argument(
+        "--no-upload",
+        action="store_true",
+        help="only write results locally, they stay in the outbox of the results directory"
+    )
+    parser.add_argument(
+        "--upload-batch-path",
+        default=None,
+        type=str,
+        help="batch endpoint of the results server, records are uploaded one by one if unset"
+    )
+    parser.add_argument(
+        "--upload-timeout",
+        default=10.0,
+        type=float,
+        help="timeout in seconds of a single upload request"
+    )
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
     main(args)
@@ -1 +1,2 @@
-from .resnet50 import Resnet50
\ No newline at end of file
+from .net import NCNNNet
+from .manifest import load_manifest, model_entry
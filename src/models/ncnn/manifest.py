@@ -0,0 +1,45 @@
+"""
+NCNN model zoo manifest
+
+The "ncnn" section of `config/models.json` describes every ncnn model by
+name: download links of its .param and .bin files, input and output blob
+names, input size, channel order and the mean/norm values ncnn's
+`substract_mean_normalize` applies to the 0-255 pixels. Keys left out take
+the values of a pnnx export of a torchvision model.
+"""
+import os
+import json
+
+
+MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "config", "models.json")
+
+DEFAULTS = {
+    "param": "",
+    "bin": "",
+    "input": "in0",
+    "output": "out0",
+    "input_size": [224, 224],
+    "pixel_format": "rgb",
+    # torchvision's Normalize on 0-255 pixels
+    "mean": [123.675, 116.28, 103.53],
+    "norm": [1 / 58.395, 1 / 57.12, 1 / 57.375],
+    "softmax": True,
+}
+
+
+def load_manifest(path=MODELS_PATH):
+    """Every ncnn model of the manifest, with defaults filled in.
+    """
+    with open(path, 'r') as f:
+        models = json.load(f).get("ncnn", {})
+    return {name: dict(DEFAULTS, **entry) for name, entry in models.items()}
+
+
+def model_entry(model_name, path=MODELS_PATH):
+    models = load_manifest(path)
+    if model_name not in models:
+        raise ValueError(f"Please provide a valid model name from {sorted(models)}")
+    entry = models[model_name]
+    if entry["pixel_format"] not in ["rgb", "bgr"]:
+        raise ValueError(f"pixel_format of {model_name} has to be rgb or bgr, got {entry['pixel_format']}")
+    return entry
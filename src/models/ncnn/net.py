@@ -0,0 +1,128 @@
+import numpy as np
+import ncnn
+
+from timing import Timer
+
+
+class NCNNNet:
+    """Runs an ncnn classifier one sample at a time.
+
+    Everything that does not depend on the sample is set up once: the
+    `net.opt` options, the softmax layer and its pipeline, and the input Mat,
+    which shares its memory with a NumPy buffer the samples are copied into.
+    Only the extractor is created per call, ncnn extractors keep the blobs
+    they computed and cannot run a second input.
+
+    With a `pixel_format` samples are (h, w, c) RGB pixels, normalized by
+    ncnn's `substract_mean_normalize` in the input Mat; otherwise they are
+    (c, h, w) float32 arrays fed as they are.
+    """
+    def __init__(self, model_param, model_bin, input_name, output_name, input_shape, num_threads=None,
+                 light_mode=True, fp16=False, winograd=True, sgemm=True, softmax=True, pixel_format=None,
+                 mean=None, norm=None, timer=None):
+        """Initialize.
+        Args:
+            input_shape (tuple): (c, h, w) of a sample
+            num_threads (int): threads of the net, ncnn's default (the big
+            cores) if None
+            light_mode (bool): release intermediate blobs as soon as they are
+            consumed
+            fp16 (bool): fp16 storage, packing and arithmetic where the cpu
+            supports them
+            winograd, sgemm (bool): convolution implementations ncnn may pick
+            softmax (bool): apply softmax to the output, for models exported
+            without it
+            pixel_format (str): "rgb" or "bgr", the channel order the model
+            expects pixels in, None for float inputs
+            mean, norm (list): per channel values subtracted from, then
+            multiplied with the pixels, empty to skip either
+        """
+        self.timer = timer if timer is not None else Timer()
+        self.input_name = input_name
+        self.output_name = output_name
+        self.pixel_format = pixel_format
+        self.mean = list(mean or [])
+        self.norm = list(norm or [])
+
+        self.net = ncnn.Net()
+        # options are read when the model is loaded, set them first
+        opt = self.net.opt
+        if num_threads is not None:
+            opt.num_threads = num_threads
+        opt.lightmode = light_mode
+        opt.use_fp16_storage = opt.use_fp16_packed = opt.use_fp16_arithmetic = fp16
+        opt.use_winograd_convolution = winograd
+        opt.use_sgemm_convolution = sgemm
+        self.num_threads = opt.num_threads
+
+        if self.net.load_param(model_param) != 0:
+            raise ValueError(f"Could not load ncnn param file {model_param}")
+        if self.net.load_model(model_bin) != 0:
+            raise ValueError(f"Could not load ncnn model file {model_bin}")
+
+        self.softmax = None
+        if softmax:
+            self.softmax = ncnn.create_layer("Softmax")
+            self.softmax.load_param(ncnn.ParamDict())
+            self.softmax.create_pipeline(self.net.opt)
+
+        # the Mat wraps the buffer without a copy
+        self.input_buffer = np.zeros(input_shape, dtype=np.float32)
+        self.input_mat = ncnn.Mat(self.input_buffer)
+
+    @classmethod
+    def from_manifest(cls, entry, model_param, model_bin, **options):
+        """Net described by a `manifest.model_entry`, options are those of `__init__`.
+        """
+        height, width = entry["input_size"]
+        return cls(
+            model_param, model_bin, input_name=entry["input"], output_name=entry["output"],
+            input_shape=(3, height, width), softmax=entry["softmax"], pixel_format=entry["pixel_format"],
+            mean=entry["mean"], norm=entry["norm"], **options)
+
+    def __call__(self, img, out=None):
+        """Runs one sample, see the class description for its layout.
+        Args:
+            out (np.ndarray): written with the flattened scores if given
+        Returns:
+            tuple: (scores, inference time of this sample)
+        """
+        # the caller owns timer.begin(), a batch may span several calls
+        start = self.timer.call_time()
+        with self.timer.span("copy_in"):
+            if self.pixel_format is None:
+                np.copyto(self.input_buffer, img, casting='same_kind')
+            else:
+                if self.pixel_format == "bgr":
+                    img = img[..., ::-1]
+                # what Mat.from_pixels does, into the Mat allocated once
+                np.copyto(self.input_buffer, img.transpose(2, 0, 1), casting='same_kind')
+                self.input_mat.substract_mean_normalize(self.mean, self.norm)
+            ex = self.net.create_extractor()
+            ex.input(self.input_name, self.input_mat)
+
+        with self.timer.span("invoke"):
+            ret, mat_out = ex.extract(self.output_name)
+            if ret != 0:
+                raise RuntimeError(f"ncnn could not extract {self.output_name}, error {ret}")
+
+        if self.softmax is not None:
+            with self.timer.span("postprocess"):
+                self.softmax.forward_inplace(mat_out, self.net.opt)
+
+        with self.timer.span("copy_out"):
+            # one copy out of the Mat, into `out` when given
+            scores = np.asarray(mat_out).reshape(-1)
+            if out is None:
+                out = scores.copy()
+            else:
+                np.copyto(out, scores)
+
+        return out, self.timer.call_time() - start
+
+    def destroy(self):
+        if self.softmax is not None:
+            self.softmax.destroy_pipeline(self.net.opt)
+            self.softmax = None
+        self.input_mat = None
+        self.net.clear()
@@ -0,0 +1,141 @@
+"""
+Content-addressed cache of preprocessed datasets
+
+Every entry is a tensor store directory named after the (backend, model)
+variant that uses it and a hash of everything that determines its content:
+the preprocess function identity and source, its parameters, the input
+size, the sample layout and the source images. Entries are evicted in least
+recently used order once the cache grows past a size limit.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import inspect
+
+import numpy as np
+
+
+META_FILE = "cache_meta.json"
+
+
+def _source_digest(func):
+    """Hash of the module a function is defined in, so edits to the function
+    or to any helper next to it invalidate the cache.
+    """
+    try:
+        with open(inspect.getsourcefile(func), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (TypeError, OSError):
+        return ""
+
+
+def _files_digest(paths):
+    """Hash of the name, size and modification time of every file, so
+    images replaced or edited in place invalidate the cache.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def cache_key(preprocess_func, size, shape, dtype, source=None, params=None, files=None):
+    """Hex digest identifying a preprocessed dataset.
+    Args:
+        preprocess_func: function used to preprocess every image
+        size: input size the function is called with
+        shape, dtype: layout of one preprocessed sample
+        source: path of the directory holding the source images
+        params: any extra keyword arguments the function is called with
+        files: paths of the source images, their names, sizes and
+        modification times are part of the key
+    """
+    description = {
+        "func": f"{preprocess_func.__module__}.{preprocess_func.__qualname__}",
+        "func_source": _source_digest(preprocess_func),
+        "size": [int(dim) for dim in size],
+        "shape": [int(dim) for dim in shape],
+        "dtype": np.dtype(dtype).name,
+        "source": os.path.abspath(source) if source else None,
+        "params": params or {},
+        "files": _files_digest(files) if files is not None else None,
+    }
+    encoded = json.dumps(description, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class PreprocessCache:
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def entry_path(self, key, variant):
+        """Directory of the cache entry for `key`, marked as just used.
+        """
+        path = os.path.join(self.root, f"{variant}-{key[:16]}")
+        os.makedirs(path, exist_ok=True)
+        self.touch(path, key=key, variant=variant)
+        return path
+
+    def touch(self, path, **meta):
+        meta_path = os.path.join(path, META_FILE)
+        current = self._read_meta(path)
+        current.update(meta)
+        current["last_used"] = time.time()
+        with open(meta_path, 'w') as f:
+            json.dump(current, f)
+
+    def _read_meta(self, path):
+        try:
+            with open(os.path.join(path, META_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def entries(self):
+        """Cache entries as (path, last_used, size in bytes), least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or not os.path.exists(os.path.join(path, META_FILE)):
+                continue
+            meta = self._read_meta(path)
+            entries.append((path, meta.get("last_used", 0.0), _dir_size(path)))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def evict(self, keep=()):
+        """Removes least recently used entries until the cache fits in `max_bytes`.
+        Entries listed in `keep` are never removed.
+        """
+        if self.max_bytes is None:
+            return []
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        keep = {os.path.abspath(path) for path in keep}
+        evicted = []
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted.append(path)
+            print(f"[INFO] Evicted preprocessing cache entry {path}")
+        return evicted
@@ -0,0 +1,173 @@
+"""
+Torch-free Resize -> CenterCrop -> ToTensor -> Normalize
+
+Reproduces `utils.preprocess_img` (torchvision on a PIL image) with NumPy
+and OpenCV only. The resize is Pillow's antialiased bilinear resampling:
+the same filter coefficients in the same fixed-point precision, a
+horizontal pass rounded to uint8 and then a vertical one. Only the output
+rows and columns inside the center crop are computed. Images are decoded
+with OpenCV instead of Pillow, both use libjpeg, so outputs match
+torchvision up to decoder rounding; `scripts/validate_preprocess.py`
+measures the difference.
+"""
+import math
+
+import numpy as np
+
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# fixed-point precision of Pillow's 8-bit resampling
+PRECISION_BITS = 32 - 8 - 2
+
+
+def _bilinear_coefficients(in_size, out_size, start, stop):
+    """Pillow's bilinear resampling coefficients of outputs `start:stop` of
+    an `in_size` -> `out_size` resize, as fixed-point integers.
+    Returns:
+        tuple: (stop - start, taps) input indices and weights
+    """
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = filterscale
+    taps = int(math.ceil(support)) * 2 + 1
+
+    indices = np.zeros((stop - start, taps), dtype=np.intp)
+    weights = np.zeros((stop - start, taps), dtype=np.float64)
+    for row, xx in enumerate(range(start, stop)):
+        center = (xx + 0.5) * scale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size) - xmin
+        x = np.arange(xmax)
+        w = np.clip(1.0 - np.abs((x + xmin - center + 0.5) / filterscale), 0.0, None)
+        total = w.sum()
+        if total != 0.0:
+            w /= total
+        indices[row, :xmax] = xmin + x
+        weights[row, :xmax] = w
+        # unused taps keep weight 0, point them at a valid pixel
+        indices[row, xmax:] = xmin
+    fixed = np.where(weights < 0, -0.5, 0.5) + weights * (1 << PRECISION_BITS)
+    return indices, fixed.astype(np.int32)
+
+
+def _resample(planes, indices, weights):
+    """One resampling pass along the last axis of (C, N, L) uint8 planes.
+    """
+    # every tap of every output gathered at once, then a weighted sum over
+    # the contiguous tap axis; int32 holds 255 * 2**PRECISION_BITS with room
+    # for the rounding term
+    acc = np.einsum('cnok,ok->cno', planes[:, :, indices].astype(np.int32), weights)
+    acc += 1 << (PRECISION_BITS - 1)
+    acc >>= PRECISION_BITS
+    return np.clip(acc, 0, 255, out=acc).astype(np.uint8)
+
+
+def resized_size(height, width, size):
+    """Output size of torchvision's `Resize(size)`: the shorter side becomes `size`.
+    """
+    short, long = (width, height) if width <= height else (height, width)
+    new_short, new_long = size, int(size * long / short)
+    return (new_long, new_short) if width <= height else (new_short, new_long)
+
+
+class ImagePreprocessor:
+    """Resize(size) -> CenterCrop(size) -> ToTensor -> Normalize(mean, std)
+    producing float32 CHW arrays.
+
+    Resampling coefficients are cached per source image size, ImageNet has
+    only a few hundred distinct ones, and results can be written into a
+    caller-provided `out` array, e.g. a row of a batch.
+    """
+    def __init__(self, size=224, mean=IMAGENET_MEAN, std=IMAGENET_STD, max_cached_sizes=512):
+        self.size = size
+        self.mean = np.asarray(mean, dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.asarray(std, dtype=np.float32).reshape(3, 1, 1)
+        self.max_cached_sizes = max_cached_sizes
+        self._coefficients = {}
+
+    def _plan(self, height, width):
+        plan = self._coefficients.get((height, width))
+        if plan is None:
+            new_height, new_width = resized_size(height, width, self.size)
+            top = int(round((new_height - self.size) / 2.0))
+            left = int(round((new_width - self.size) / 2.0))
+            rows = _bilinear_coefficients(height, new_height, top, top + self.size)
+            cols = _bilinear_coefficients(width, new_width, left, left + self.size)
+            if len(self._coefficients) >= self.max_cached_sizes:
+                self._coefficients.clear()
+            plan = self._coefficients[(height, width)] = (rows, cols)
+        return plan
+
+    def _resize_crop_planar(self, rgb):
+        (row_indices, row_weights), (col_indices, col_weights) = self._plan(*rgb.shape[:2])
+        # horizontal pass only over the rows the vertical pass reads, on
+        # channel planes so both passes gather along the last axis
+        first, last = row_indices.min(), row_indices.max() + 1
+        planes = np.ascontiguousarray(rgb[first:last].transpose(2, 0, 1))
+        resized = _resample(planes, col_indices, col_weights)
+        resized = np.ascontiguousarray(resized.transpose(0, 2, 1))
+        return _resample(resized, row_indices - first, row_weights).transpose(0, 2, 1)
+
+    def resize_crop(self, rgb):
+        """Resized and center-cropped HWC uint8 image.
+        """
+        return self._resize_crop_planar(rgb).transpose(1, 2, 0)
+
+    def from_rgb(self, rgb, out=None):
+        """Preprocesses a decoded HWC uint8 RGB image.
+        """
+        if out is None:
+            out = np.empty((3, self.size, self.size), dtype=np.float32)
+        # same float32 operations as ToTensor and Normalize
+        np.divide(self._resize_crop_planar(rgb), np.float32(255), out=out)
+        np.subtract(out, self.mean, out=out)
+        np.divide(out, self.std, out=out)
+        return out
+
+    def __call__(self, filename, out=None):
+        return self.from_rgb(decode_rgb(filename), out=out)
+
+    def batch(self, filenames, out=None):
+        """Preprocesses several images into one (N, 3, size, size) array.
+        """
+        if out is None:
+            out = np.empty((len(filenames), 3, self.size, self.size), dtype=np.float32)
+        for i, filename in enumerate(filenames):
+            self(filename, out=out[i])
+        return out
+
+
+def decode_rgb(filename):
+    import cv2
+    # Pillow ignores the EXIF orientation, so does torchvision's pipeline
+    image = cv2.imread(filename, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        raise ValueError(f"Could not decode {filename}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+# one preprocessor per process, so workers of a preprocessing pool reuse
+# their coefficient cache across images
+_preprocessors = {}
+
+
+def _preprocessor(size):
+    preprocessor = _preprocessors.get(size[0])
+    if preprocessor is None:
+        preprocessor = _preprocessors[size[0]] = ImagePreprocessor(size[0])
+    return preprocessor
+
+
+def preprocess_img(filename, size=(224, 224)):
+    """Drop-in replacement of `utils.preprocess_img` without torch.
+    """
+    return _preprocessor(size)(filename)
+
+
+def preprocess_pixels(filename, size=(224, 224)):
+    """Resized and center-cropped HWC uint8 RGB pixels, for backends that
+    normalize inputs themselves, e.g. ncnn's `substract_mean_normalize`.
+    """
+    return np.ascontiguousarray(_preprocessor(size).resize_crop(decode_rgb(filename)))
@@ -0,0 +1,133 @@
+"""
+Parallel preprocessing engine for building the ImageNet cache
+"""
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+
+import hardware
+
+
+# per-worker state, set once by the pool initializer so that the preprocess
+# function is pickled once per worker instead of once per image
+_worker_func = None
+_worker_size = None
+
+
+def _set_worker(preprocess_func, size):
+    global _worker_func, _worker_size
+    _worker_func = preprocess_func
+    _worker_size = size
+
+
+def _init_worker(preprocess_func, size):
+    """Pool initializer, only for worker processes: the main process keeps
+    the affinity and opencv threads the backend runs with.
+    """
+    _set_worker(preprocess_func, size)
+    # workers forked after the backend pinned its cores may use all of them
+    hardware.unpin()
+    try:
+        # every worker already owns a core, keep opencv from spawning more threads
+        import cv2
+        cv2.setNumThreads(1)
+    except ImportError:
+        pass
+
+
+def _run_worker(jpeg_path):
+    return _worker_func(jpeg_path, size=_worker_size)
+
+
+def quantize(inputs, scale, zero_point, dtype):
+    """Affine quantization of float inputs to the integer `dtype` of a model
+    input: round half away from zero like TFLite, then saturate.
+    """
+    info = np.iinfo(dtype)
+    values = np.asarray(inputs, dtype=np.float32) / np.asarray(scale, dtype=np.float32)
+    values = np.trunc(values + np.copysign(np.float32(0.5), values))
+    values += np.asarray(zero_point, dtype=np.float32)
+    np.clip(values, info.min, info.max, out=values)
+    return values.astype(dtype)
+
+
+class QuantizedPreprocess:
+    """Preprocess function followed by the input quantization of a model, so
+    that the preprocessed dataset holds tensors ready to feed.
+    Args:
+        func: preprocess function producing float inputs
+        scale, zero_point: quantization parameters of the model input, one
+        value or one per channel (last axis)
+        dtype: integer dtype of the model input
+    """
+    def __init__(self, func, scale, zero_point, dtype):
+        self.func = func
+        self.__name__ = f"{func.__name__}_quantized"
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.zero_point = np.asarray(zero_point, dtype=np.float32)
+        self.dtype = np.dtype(dtype)
+
+    def __call__(self, jpeg_path, size=(224, 224)):
+        return quantize(self.func(jpeg_path, size=size), self.scale, self.zero_point, self.dtype)
+
+
+class PreprocessEngine:
+    """Spreads a preprocess function over a process pool.
+
+    Images are handed to the workers in chunks and results come back in
+    submission order, so they are appended to the store in the same order as
+    the input list. Rows already in the store are skipped, which makes an
+    interrupted run resumable.
+    """
+    def __init__(self, preprocess_func, size=(224, 224), workers=None, chunksize=16):
+        self.preprocess_func = preprocess_func
+        self.size = size
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.chunksize = max(1, chunksize)
+
+    def _imap(self, jpeg_paths):
+        if self.workers == 1:
+            _set_worker(self.preprocess_func, self.size)
+            for jpeg_path in jpeg_paths:
+                yield _run_worker(jpeg_path)
+            return
+
+        with Pool(self.workers, initializer=_init_worker,
+                  initargs=(self.preprocess_func, self.size)) as pool:
+            for result in pool.imap(_run_worker, jpeg_paths, chunksize=self.chunksize):
+                yield result
+
+    def probe(self, jpeg_path):
+        """Preprocesses a single image in-process, used to find the sample
+        shape and dtype before a store is created.
+        """
+        return self.preprocess_func(jpeg_path, size=self.size)
+
+    def run(self, jpeg_paths, writer):
+        """Preprocesses every jpeg in `jpeg_paths` and appends it to `writer`,
+        a `tensor_store.TensorStoreWriter` created for the same images.
+        Returns:
+            dict: number of processed/skipped images and throughput in images/s
+        """
+        skipped = min(writer.count, writer.target)
+        pending = jpeg_paths[skipped:writer.target]
+        if 0 < skipped < writer.target:
+            print(f"[INFO] Resuming preprocessing, {skipped} images already done.")
+        elif skipped:
+            print(f"[INFO] Reusing the preprocessed store with all {skipped} images.")
+
+        start = time.perf_counter()
+        results = self._imap(pending)
+        for preprocessed in tqdm(results, total=len(pending), desc="Preprocessing", unit="image"):
+            writer.append(preprocessed)
+        writer.close()
+        elapsed = time.perf_counter() - start
+
+        throughput = len(pending) / elapsed if elapsed > 0 and pending else 0.0
+        if pending:
+            print(f"[INFO] Preprocessed {len(pending)} images with {self.workers} workers "
+                  f"in {elapsed:.1f}s ({throughput:.1f} images/s)")
+        return {"processed": len(pending), "skipped": skipped, "images_per_sec": throughput}
@@ -0,0 +1,294 @@
+"""
+Durable results outbox with a background, retrying uploader
+
+Results are appended to an on-disk outbox before anything goes over the
+network, so a failed upload never loses a run. A background thread uploads
+pending records over a pooled HTTP session with exponential backoff,
+optionally batching several records per request; records still pending at
+exit stay in the outbox and are flushed by the next run, or with
+
+    python3 src/results_sink.py --outbox /home/mlbench_results
+"""
+import os
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+RESULTS_URL = "http://transcription.kurg.org:27017"
+
+# endpoint of every record kind on the results server
+ENDPOINTS = {
+    "benchmark": "/bench/insert",
+    "metric": "/bench/insert_metric",
+}
+
+
+def json_safe(value):
+    """Copy of a JSON-like value with NaN and infinite floats replaced by
+    None. `json.dump` writes them as bare NaN/Infinity, which is not JSON and
+    which requests refuses to send; telemetry gaps are NaN after `tolist()`.
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+
+class PermanentUploadError(Exception):
+    """A record that no retry can upload, e.g. a payload that does not
+    serialize or a metric whose benchmark got no `benchmark_id`.
+    """
+
+
+class Outbox:
+    """Append-only JSONL journal of records and of their acknowledgements.
+
+    A metric record refers to the benchmark record it belongs to with
+    `parent`; it becomes uploadable once its parent was acknowledged with
+    the `benchmark_id` the server assigned. Records that can never be
+    uploaded are acknowledged as failed, with the reason, so they stop
+    being pending.
+    """
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.records_path = os.path.join(directory, "outbox.jsonl")
+        self.acks_path = os.path.join(directory, "outbox_acks.jsonl")
+        self.lock = threading.Lock()
+
+    def _append(self, path, entry):
+        with self.lock, open(path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read(self, path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # torn last line of an interrupted write
+                    continue
+        return entries
+
+    def append(self, kind, payload, parent=None):
+        record_id = uuid.uuid4().hex
+        self._append(self.records_path, {
+            "id": record_id, "kind": kind, "parent": parent, "created": time.time(), "payload": json_safe(payload),
+        })
+        return record_id
+
+    def ack(self, record_id, benchmark_id=None):
+        self._append(self.acks_path, {"id": record_id, "benchmark_id": benchmark_id})
+
+    def fail(self, record_id, reason):
+        self._append(self.acks_path, {"id": record_id, "benchmark_id": None, "failed": reason})
+
+    def acks(self):
+        return {ack["id"]: ack.get("benchmark_id") for ack in self._read(self.acks_path)}
+
+    def failed(self):
+        """Reasons of the records acknowledged as failed, by record id.
+        """
+        return {ack["id"]: ack["failed"] for ack in self._read(self.acks_path) if ack.get("failed")}
+
+    def pending(self):
+        """Records not acknowledged yet, in the order they were written.
+        """
+        acks = self.acks()
+        return [record for record in self._read(self.records_path) if record["id"] not in acks]
+
+
+class ResultsUploader:
+    """Uploads pending outbox records on a background thread.
+    Args:
+        outbox: `Outbox` to drain
+        base_url: results server, `None` keeps everything local
+        batch_path: endpoint taking {"records": [{"kind", "payload"}]} and
+        returning {"results": [...]}, records are sent one by one if unset
+        batch_size: records per batch request
+    """
+    def __init__(self, outbox, base_url=RESULTS_URL, batch_path=None, batch_size=16,
+                 max_retries=5, backoff=1.0, timeout=10.0):
+        self.outbox = outbox
+        self.base_url = base_url
+        self.batch_path = batch_path
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _post(self, path, payload):
+        for attempt in range(self.max_retries):
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.InvalidJSONError as e:
+                # a RequestException, but the same payload fails every time
+                raise PermanentUploadError(f"payload does not serialize: {e}") from e
+            except (requests.RequestException, ValueError) as e:
+                if attempt == self.max_retries - 1 or self.stop_event.is_set():
+                    raise
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                print(f"[WARN] Upload to {path} failed ({e}), retrying in {delay:.1f}s")
+                self.stop_event.wait(delay)
+
+    def _prepare(self, record, acks):
+        """Request payload of a record.
+        Raises:
+            PermanentUploadError: the record can never be uploaded
+        """
+        payload = dict(record["payload"])
+        if record["parent"] is not None:
+            if acks[record["parent"]] is None:
+                raise PermanentUploadError(
+                    f"benchmark record {record['parent']} was acknowledged without a benchmark_id")
+            payload["benchmark_id"] = acks[record["parent"]]
+        try:
+            json.dumps(payload, allow_nan=False)
+        except (TypeError, ValueError) as e:
+            raise PermanentUploadError(f"payload does not serialize: {e}") from e
+        return payload
+
+    def _fail(self, record, error):
+        print(f"[ERROR] Dropping {record['kind']} record {record['id']} from the upload: {error}")
+        self.outbox.fail(record["id"], str(error))
+
+    def _prepared(self, records, acks):
+        """(record, payload) of every record that can be uploaded, the others
+        are marked failed.
+        """
+        prepared = []
+        for record in records:
+            try:
+                prepared.append((record, self._prepare(record, acks)))
+            except PermanentUploadError as e:
+                self._fail(record, e)
+        return prepared
+
+    def upload_pending(self):
+        """Uploads every record whose parent is acknowledged, benchmarks
+        first so their metrics can follow in the same pass.
+        Returns:
+            int: number of records uploaded
+        """
+        uploaded = 0
+        for kind in ["benchmark", "metric"]:
+            acks = self.outbox.acks()
+            ready = self._prepared([
+                record for record in self.outbox.pending()
+                if record["kind"] == kind and (record["parent"] is None or record["parent"] in acks)
+            ], acks)
+            if self.batch_path:
+                for start in range(0, len(ready), self.batch_size):
+                    batch = ready[start:start + self.batch_size]
+                    response = self._post(self.batch_path, {"records": [
+                        {"kind": record["kind"], "payload": payload} for record, payload in batch
+                    ]})
+                    for (record, _), result in zip(batch, response["results"]):
+                        self.outbox.ack(record["id"], (result or {}).get("benchmark_id"))
+                    uploaded += len(batch)
+            else:
+                for record, payload in ready:
+                    try:
+                        response = self._post(ENDPOINTS[kind], payload)
+                    except PermanentUploadError as e:
+                        self._fail(record, e)
+                        continue
+                    self.outbox.ack(record["id"], (response or {}).get("benchmark_id"))
+                    uploaded += 1
+        return uploaded
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                self.upload_pending()
+            except Exception as e:
+                print(f"[WARN] Results upload failed, records stay in the outbox: {e}")
+            # a record put during the pass set `wakeup` again and gets one more pass
+            if self.closing and not self.wakeup.is_set():
+                return
+
+    def start(self):
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.wakeup.set()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def close(self, timeout=30.0):
+        """Lets the uploader finish its passes for up to `timeout` seconds,
+        then abandons retries; the daemon thread never blocks interpreter exit.
+        """
+        if self.thread is None:
+            return
+        self.closing = True
+        self.wakeup.set()
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.stop_event.set()
+            self.wakeup.set()
+
+
+class ResultsSink:
+    """Local-first results writer: every record goes to the outbox and is
+    then uploaded in the background unless `upload` is off.
+    """
+    def __init__(self, directory, base_url=RESULTS_URL, upload=True, **uploader_kwargs):
+        self.outbox = Outbox(directory)
+        self.uploader = None
+        if upload and base_url:
+            self.uploader = ResultsUploader(self.outbox, base_url, **uploader_kwargs)
+            self.uploader.start()
+
+    def put(self, kind, payload, parent=None):
+        record_id = self.outbox.append(kind, payload, parent=parent)
+        if self.uploader is not None:
+            self.uploader.notify()
+        return record_id
+
+    def close(self, timeout=30.0):
+        if self.uploader is None:
+            return
+        self.uploader.close(timeout)
+        pending = len(self.outbox.pending())
+        if pending:
+            print(f"[INFO] {pending} results left in the outbox, they are uploaded on the next run.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="upload the pending records of a results outbox")
+    parser.add_argument("--outbox", required=True, type=str, help="directory holding outbox.jsonl")
+    parser.add_argument("--results-url", default=RESULTS_URL, type=str, help="results server")
+    parser.add_argument("--batch-path", default=None, type=str, help="batch upload endpoint")
+    args = parser.parse_args()
+
+    uploader = ResultsUploader(Outbox(args.outbox), args.results_url, batch_path=args.batch_path)
+    print(f"Uploaded {uploader.upload_pending()} records")
@@ -0,0 +1,72 @@
+"""
+Compact columnar file for the detailed data of one run
+
+Telemetry columns, power samples and per-inference latencies are stored as
+typed arrays in a compressed `.npz` next to the summary JSON instead of as
+JSON lists. Column names are grouped as `<group>/<name>`, e.g.
+`telemetry/cpu`, `power/timestamp` or `latency/seconds`; scalar metadata
+(phase windows, the schema version, ...) is kept as JSON in `meta`.
+
+    data = RunData.load("results/resnet50/fp32_results_stats.npz")
+    data.group("telemetry")["temperature"], data.meta["phases"]
+"""
+import json
+
+import numpy as np
+
+
+SCHEMA_VERSION = 1
+
+
+def write_run_data(path, columns, meta=None):
+    """Writes `columns` ({"group/name": array}) and the json-serialisable `meta`.
+    Returns:
+        str: path of the written file
+    """
+    if not path.endswith(".npz"):
+        path += ".npz"
+    meta = dict(meta or {}, schema_version=SCHEMA_VERSION)
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    arrays["meta"] = np.array(json.dumps(meta))
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return path
+
+
+class RunData:
+    """Reader of a file written by `write_run_data`.
+    """
+    def __init__(self, columns, meta):
+        self.columns = columns
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            meta = json.loads(str(f["meta"]))
+            version = meta.get("schema_version")
+            if version is None or version > SCHEMA_VERSION:
+                raise ValueError(f"Unsupported run data schema {version} in {path}, expected <= {SCHEMA_VERSION}")
+            columns = {name: f[name] for name in f.files if name != "meta"}
+        return cls(columns, meta)
+
+    @property
+    def schema_version(self):
+        return self.meta["schema_version"]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def group(self, group):
+        """Columns of one group keyed by their name within the group.
+        """
+        prefix = f"{group}/"
+        return {name[len(prefix):]: column for name, column in self.columns.items() if name.startswith(prefix)}
+
+    def to_dict(self):
+        """Columns as nested lists, for consumers expecting the JSON layout.
+        """
+        return {name: column.tolist() for name, column in self.columns.items()}
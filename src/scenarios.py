@@ -0,0 +1,205 @@
+"""
+MLPerf-style load-generator scenarios
+
+Every scenario drives a loaded `Backend` over a `tensor_store.TensorStore`,
+hands each result to an `on_result(ids, labels, outputs)` callback and
+returns the latencies it measured together with its own pass/fail metrics.
+"""
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from loader import PrefetchLoader
+
+
+class Scenario:
+    name = None
+    # what one measured latency covers: a "query" or, in Offline, a "batch"
+    latency_unit = "query"
+
+    def __init__(self, prefetch_depth=4, prefetch_mode="thread"):
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_mode = prefetch_mode
+
+    def _loader(self, dataset, batch_size):
+        return PrefetchLoader(
+            dataset, depth=self.prefetch_depth, mode=self.prefetch_mode, batch_size=batch_size)
+
+    def run(self, backend, dataset, on_result):
+        """Returns:
+            dict: `latencies` (seconds, one per `latency_unit`), `run_time`
+            (seconds), `samples` and the scenario `metrics` including a
+            `valid` flag
+        """
+        raise NotImplementedError("run not implemented")
+
+
+class SingleStream(Scenario):
+    """One sample per query, the next query is issued when the previous one
+    completed. Valid when the p90 latency is within `target_latency_ms`.
+    """
+    name = "single-stream"
+
+    def __init__(self, target_latency_ms=None, **kwargs):
+        super(SingleStream, self).__init__(**kwargs)
+        self.target_latency_ms = target_latency_ms
+
+    def run(self, backend, dataset, on_result):
+        latencies = []
+        loader = self._loader(dataset, 1)
+        start = time.perf_counter()
+        # a closed loop: one blocking call per query, never several in flight
+        # like backend.stream may keep
+        for ids, inputs, labels in tqdm(loader, total=len(loader), desc="Running inference", unit="query"):
+            outputs, infer_time = backend(inputs)
+            latencies.append(infer_time)
+            on_result(ids, labels, outputs)
+        run_time = time.perf_counter() - start
+
+        p90 = float(np.percentile(latencies, 90)) * 1000
+        metrics = {
+            "p90_ms": round(p90, 3),
+            "target_latency_ms": self.target_latency_ms,
+            "valid": self.target_latency_ms is None or p90 <= self.target_latency_ms,
+        }
+        return {"latencies": np.array(latencies), "run_time": run_time, "samples": len(dataset), "metrics": metrics}
+
+
+class Offline(Scenario):
+    """All samples are available at once and sent in batches of
+    `batch_size` as fast as the backend takes them. The metric is
+    throughput; a run is always valid.
+    """
+    name = "offline"
+    latency_unit = "batch"
+
+    def __init__(self, batch_size=1, **kwargs):
+        super(Offline, self).__init__(**kwargs)
+        self.batch_size = batch_size
+
+    def run(self, backend, dataset, on_result):
+        latencies = []
+        loader = self._loader(dataset, self.batch_size)
+        start = time.perf_counter()
+        for ids, labels, outputs, infer_time in tqdm(
+                backend.stream(loader), total=len(loader), desc="Running inference", unit="batch"):
+            latencies.append(infer_time)
+            on_result(ids, labels, outputs)
+        run_time = time.perf_counter() - start
+
+        metrics = {
+            "throughput": round(len(dataset) / run_time, 3),
+            "valid": True,
+        }
+        return {"latencies": np.array(latencies), "run_time": run_time, "samples": len(dataset), "metrics": metrics}
+
+
+class Server(Scenario):
+    """Single-sample queries arrive as a Poisson process at `target_qps`.
+    A query's latency runs from its scheduled arrival to its completion,
+    so it includes the time spent queued behind earlier queries. Valid when
+    the p99 latency stays within `latency_bound_ms`.
+    """
+    name = "server"
+
+    def __init__(self, target_qps, latency_bound_ms, seed=0, **kwargs):
+        super(Server, self).__init__(**kwargs)
+        self.target_qps = target_qps
+        self.latency_bound_ms = latency_bound_ms
+        self.seed = seed
+
+    def run(self, backend, dataset, on_result):
+        rng = np.random.default_rng(self.seed)
+        arrivals = np.cumsum(rng.exponential(1.0 / self.target_qps, size=len(dataset)))
+        latencies = []
+        start = time.perf_counter()
+        for arrival, (ids, inputs, labels) in tqdm(
+                zip(arrivals, self._loader(dataset, 1)), total=len(dataset),
+                desc="Running inference", unit="query"):
+            now = time.perf_counter() - start
+            if now < arrival:
+                time.sleep(arrival - now)
+            outputs, _ = backend(inputs)
+            latencies.append(time.perf_counter() - start - arrival)
+            on_result(ids, labels, outputs)
+        run_time = time.perf_counter() - start
+
+        latencies = np.array(latencies)
+        p99 = float(np.percentile(latencies, 99)) * 1000
+        metrics = {
+            "target_qps": self.target_qps,
+            "achieved_qps": round(len(dataset) / run_time, 3),
+            "latency_bound_ms": self.latency_bound_ms,
+            "p99_ms": round(p99, 3),
+            "late_fraction": round(float(np.mean(latencies * 1000 > self.latency_bound_ms)), 4),
+            "valid": p99 <= self.latency_bound_ms,
+        }
+        return {"latencies": latencies, "run_time": run_time, "samples": len(dataset), "metrics": metrics}
+
+
+class MultiStream(Scenario):
+    """Queries of `samples_per_query` samples are issued every `interval_ms`,
+    one per stream. A query's latency runs from its scheduled issue to the
+    completion of its last sample; when a query overruns, the following ones
+    are issued late. Valid when the p99 query latency fits in the interval.
+    """
+    name = "multi-stream"
+
+    def __init__(self, samples_per_query=8, interval_ms=50.0, **kwargs):
+        super(MultiStream, self).__init__(**kwargs)
+        self.samples_per_query = samples_per_query
+        self.interval_ms = interval_ms
+
+    def run(self, backend, dataset, on_result):
+        interval = self.interval_ms / 1000
+        loader = self._loader(dataset, self.samples_per_query)
+        latencies = []
+        start = time.perf_counter()
+        for query, (ids, inputs, labels) in tqdm(
+                enumerate(loader), total=len(loader), desc="Running inference", unit="query"):
+            issue = query * interval
+            now = time.perf_counter() - start
+            if now < issue:
+                time.sleep(issue - now)
+            # a query larger than the backend batch is split over several calls
+            for offset in range(0, len(inputs), backend.batch_size):
+                end = offset + backend.batch_size
+                outputs, _ = backend(inputs[offset:end])
+                on_result(ids[offset:end], labels[offset:end], outputs)
+            latencies.append(time.perf_counter() - start - issue)
+        run_time = time.perf_counter() - start
+
+        latencies = np.array(latencies)
+        p99 = float(np.percentile(latencies, 99)) * 1000
+        metrics = {
+            "samples_per_query": self.samples_per_query,
+            "interval_ms": self.interval_ms,
+            "p99_ms": round(p99, 3),
+            "overrun_fraction": round(float(np.mean(latencies > interval)), 4),
+            "valid": p99 <= self.interval_ms,
+        }
+        return {"latencies": latencies, "run_time": run_time, "samples": len(dataset), "metrics": metrics}
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [SingleStream, Offline, Server, MultiStream]}
+
+
+def make_scenario(args):
+    """Builds the scenario selected on the command line.
+    """
+    common = {"prefetch_depth": args.prefetch_depth, "prefetch_mode": args.prefetch_mode}
+    if args.scenario == "single-stream":
+        if args.batch_size > 1:
+            print(f"[WARN] The single-stream scenario sends one sample per query, --batch-size {args.batch_size} "
+                  "is not used, pass --scenario offline to run batches")
+        return SingleStream(target_latency_ms=args.target_latency_ms, **common)
+    if args.scenario == "offline":
+        return Offline(batch_size=args.batch_size, **common)
+    if args.scenario == "server":
+        if args.server_qps is None:
+            raise ValueError("Please provide the target query rate of the server scenario --server-qps")
+        return Server(args.server_qps, args.server_latency_ms, **common)
+    if args.scenario == "multi-stream":
+        return MultiStream(args.multistream_samples, args.multistream_interval_ms, **common)
+    raise ValueError(f"Unknown scenario {args.scenario}, expected one of {list(SCENARIOS)}")
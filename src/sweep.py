@@ -0,0 +1,229 @@
+"""
+Benchmark matrix runner
+
+Runs every configuration of a sweep in one long-lived process, sharing the
+label index, the image listing and the preprocessed datasets between runs
+instead of paying for them on each `main.py` invocation. Backends listed in
+`isolate` (tensorrt by default, which owns a CUDA context) run in a forked
+child process so a crash or leaked device state cannot affect later runs;
+the child inherits what was already loaded.
+
+A sweep file is JSON (or YAML when PyYAML is installed):
+
+    {
+        "defaults": {"imagenet": "/mnt/workspace/imagenet-2012/val", "input_size": "224,224", "count": 1000,
+                     "scenario": "offline"},
+        "matrix": {"backend": ["onnxruntime", "ncnn"], "model_name": ["resnet50"], "batch_size": [1, 8]},
+        "exclude": [{"backend": "ncnn", "batch_size": 8}],
+        "include": [{"backend": "tensorrt", "model_name": "mobilenet_v2", "precision": "fp16"}],
+        "isolate": ["tensorrt"]
+    }
+
+Keys are `main.py` argument names. Without a sweep file the models of one
+backend listed in `config/models.json` are swept:
+
+    python3 src/sweep.py --sweep sweep.json --results_dir /home/mlbench_results
+    python3 src/sweep.py --models-json --backend tflite --device cpu --input_size 224,224
+"""
+import os
+import json
+import time
+import argparse
+import itertools
+import traceback
+import multiprocessing
+
+import main as benchmark
+
+
+MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "models.json")
+
+
+def load_sweep(path):
+    with open(path, 'r') as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def expand(sweep):
+    """Configurations of a sweep: the cartesian product of `matrix` minus the
+    combinations matching an `exclude` entry, plus the `include` entries.
+    """
+    matrix = sweep.get("matrix", {})
+    names = list(matrix)
+    configs = [dict(zip(names, values)) for values in itertools.product(*matrix.values())] if names else []
+    excludes = sweep.get("exclude", [])
+    configs = [
+        config for config in configs
+        if not any(all(config.get(key) == value for key, value in exclude.items()) for exclude in excludes)
+    ]
+    return configs + [dict(config) for config in sweep.get("include", [])]
+
+
+def models_json_sweep(backend, device=None, path=MODELS_PATH):
+    """Sweep over every model `config/models.json` lists for `backend`.
+    """
+    with open(path, 'r') as f:
+        models = json.load(f)
+    if backend == "tflite":
+        if device is None:
+            raise ValueError("device is none.")
+        return {"include": [
+            {"backend": backend, "device": device, "model_name": name}
+            for name, link in models[backend][device].items() if link
+        ]}
+    if backend == "tensorrt":
+        include = []
+        for key in models[backend]:
+            name, precision = key.rsplit("_", 1)
+            include.append({"backend": backend, "model_name": name, "precision": precision})
+        return {"include": include}
+    if backend == "ncnn":
+        # models without download links need a --model_path, they are left out
+        return {"include": [
+            {"backend": backend, "model_name": name,
+             "input_size": ",".join(str(dim) for dim in entry.get("input_size", [224, 224]))}
+            for name, entry in models[backend].items() if entry.get("param") and entry.get("bin")
+        ]}
+    raise ValueError(f"config/models.json lists no models for backend {backend}")
+
+
+def config_args(parser, base, config):
+    """`main.py` arguments of one configuration: `base` with the config's
+    values, strings converted like they would be on the command line.
+    """
+    args = argparse.Namespace(**vars(base))
+    actions = {action.dest: action for action in parser._actions}
+    for key, value in config.items():
+        dest = key.lstrip("-").replace("-", "_")
+        if dest not in actions:
+            raise ValueError(f"Unknown benchmark argument {key}")
+        action = actions[dest]
+        if isinstance(value, str) and action.type is not None:
+            value = action.type(value)
+        elif isinstance(value, list) and dest == "input_size":
+            value = tuple(value)
+        setattr(args, dest, value)
+    return args
+
+
+def config_name(config):
+    return "_".join(f"{value}" for value in config.values()).replace(",", "x").replace("/", "-")
+
+
+def _run_isolated(args, shared, queue):
+    try:
+        queue.put(("ok", benchmark.main(args, shared)))
+    except Exception:
+        queue.put(("error", traceback.format_exc()))
+
+
+def run_config(args, shared, isolate):
+    """Runs one configuration, in a forked child when `isolate`.
+    Returns:
+        tuple: status ("ok"/"error") and the benchmark summary or traceback
+    """
+    if not isolate:
+        try:
+            return "ok", benchmark.main(args, shared)
+        except Exception:
+            return "error", traceback.format_exc()
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_run_isolated, args=(args, shared, queue))
+    process.start()
+    # read before joining, a large result would otherwise block the child
+    try:
+        result = queue.get()
+    except Exception:
+        result = ("error", "no result from the benchmark process")
+    process.join()
+    if process.exitcode and result[0] == "ok":
+        result = ("error", f"benchmark process exited with {process.exitcode}")
+    return result
+
+
+def run_sweep(sweep, base, parser, results_dir):
+    """Runs every configuration of `sweep` and writes the consolidated
+    `sweep_report.json` to `results_dir`.
+    """
+    isolate = set(sweep.get("isolate", ["tensorrt"]))
+    configs = expand(sweep)
+    base = config_args(parser, base, sweep.get("defaults", {}))
+    shared = {}
+
+    # load the label index and image listing once, forked children inherit them
+    shared.update({
+        "imagenet": base.imagenet,
+        "labels": benchmark.load_labels(base.imagenet),
+        "jpeg_files": sorted(f for f in os.listdir(base.imagenet) if f.lower().endswith('.jpeg')),
+        "stores": {},
+    })
+
+    report = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": []}
+    for i, config in enumerate(configs):
+        args = config_args(parser, base, config)
+        name = config_name(config)
+        args.results_dir = os.path.join(results_dir, name)
+        print(f"[{i + 1}/{len(configs)}] {name}")
+
+        start = time.perf_counter()
+        status, result = run_config(args, shared, args.backend in isolate)
+        run = {"name": name, "config": config, "status": status, "wall_time_s": round(time.perf_counter() - start, 3)}
+        if status == "ok":
+            run["result"] = result
+        else:
+            print(f"[ERROR] {name} failed:\n{result}")
+            run["error"] = result
+        report["runs"].append(run)
+
+    report["finished"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    os.makedirs(results_dir, exist_ok=True)
+    report_path = os.path.join(results_dir, "sweep_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"Sweep report written to {report_path}")
+    return report
+
+
+def print_report(report):
+    # latencies are per query, or per batch in the offline scenario
+    print(f"{'configuration':<48} {'status':<6} {'acc %':>7} {'lat ms':>8} {'p99 ms':>8} {'per':<5} {'img/s':>9}")
+    for run in report["runs"]:
+        result = run.get("result") or {}
+        p99 = result.get("latency_stats", {}).get("p99", "")
+        print(f"{run['name'][:48]:<48} {run['status']:<6} {result.get('accuracy', ''):>7} "
+              f"{result.get('latency', ''):>8} {p99:>8} {result.get('latency_unit', ''):<5} "
+              f"{result.get('throughput', ''):>9}")
+
+
+if __name__ == '__main__':
+    parser = benchmark.build_parser()
+    # the input size may come from the sweep file instead
+    for action in parser._actions:
+        if action.dest == "input_size":
+            action.required = False
+    sweep_parser = argparse.ArgumentParser(parents=[parser], add_help=False, conflict_handler="resolve")
+    group = sweep_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--sweep", type=str, help="JSON/YAML sweep file")
+    group.add_argument(
+        "--models-json",
+        action="store_true",
+        help="sweep every model config/models.json lists for --backend (and --device for tflite)"
+    )
+    sweep_args, rest = sweep_parser.parse_known_args()
+    if rest:
+        sweep_parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    base = argparse.Namespace(**{
+        key: value for key, value in vars(sweep_args).items() if key not in ["sweep", "models_json"]
+    })
+    if sweep_args.sweep:
+        sweep = load_sweep(sweep_args.sweep)
+    else:
+        sweep = models_json_sweep(base.backend, base.device)
+    run_sweep(sweep, base, parser, base.results_dir or "results")
@@ -0,0 +1,151 @@
+"""
+Fixed-rate, non-blocking telemetry sampling
+
+Sysfs and procfs nodes are opened once and re-read with `os.pread`, cpu
+usage is computed from `/proc/stat` deltas between samples instead of
+blocking in `psutil.cpu_percent(interval=1)`, and every sample is
+timestamped with `timing.clock_ns`, the clock backends time inference with.
+"""
+import os
+import threading
+
+from timing import clock_ns
+
+
+class SysfsNode:
+    """Sysfs file kept open and re-read from offset 0 on every sample.
+    """
+    def __init__(self, path, scale=1.0):
+        self.path = path
+        self.scale = scale
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read_raw(self):
+        return float(os.pread(self.fd, 64, 0))
+
+    def __call__(self):
+        return self.read_raw() / self.scale
+
+    def close(self):
+        os.close(self.fd)
+
+
+class NodeGroup:
+    """Reads several nodes as one metric, e.g. the frequency of every core.
+    """
+    def __init__(self, nodes, reduce=None):
+        self.nodes = nodes
+        self.reduce = reduce
+
+    def __call__(self):
+        values = [node() for node in self.nodes]
+        return self.reduce(values) if self.reduce else values
+
+    def close(self):
+        for node in self.nodes:
+            node.close()
+
+
+class ProcStatCpu:
+    """Per-core cpu usage in percent since the previous read, from /proc/stat.
+    """
+    def __init__(self, path="/proc/stat"):
+        self.fd = os.open(path, os.O_RDONLY)
+        self._prev = self._read_times()
+
+    def _read_times(self):
+        data = b""
+        while True:
+            chunk = os.pread(self.fd, 65536, len(data))
+            if not chunk:
+                break
+            data += chunk
+        times = []
+        for line in data.decode().splitlines():
+            # per-core lines only, "cpu " is the aggregate
+            if line.startswith("cpu") and line[3].isdigit():
+                fields = [int(value) for value in line.split()[1:]]
+                # idle + iowait count as idle time
+                times.append((sum(fields), fields[3] + fields[4]))
+        return times
+
+    def __call__(self):
+        current = self._read_times()
+        usage = []
+        for (total, idle), (prev_total, prev_idle) in zip(current, self._prev):
+            elapsed = total - prev_total
+            usage.append(100.0 * (elapsed - (idle - prev_idle)) / elapsed if elapsed > 0 else 0.0)
+        self._prev = current
+        return usage
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ApexTpuFreq:
+    """Edge TPU clock derived from the thermal trip points of the apex driver,
+    the driver throttles to 250/125/62.5 MHz past trip point 0/1/2.
+    """
+    def __init__(self, temp_path="/sys/class/thermal/thermal_zone0/temp", apex_dir="/sys/class/apex/apex_0"):
+        self.temp = SysfsNode(temp_path)
+        # trip points are static, read them once
+        self.trip_points = []
+        for i in range(3):
+            node = SysfsNode(os.path.join(apex_dir, f"trip_point{i}_temp"))
+            self.trip_points.append(node())
+            node.close()
+
+    def __call__(self):
+        temp = self.temp()
+        for trip_point, freq in zip(reversed(self.trip_points), [62.5, 125.0, 250.0]):
+            if temp >= trip_point:
+                return freq
+        return 500.0
+
+    def close(self):
+        self.temp.close()
+
+
+class TelemetrySampler:
+    """Samples every source at `rate_hz` on a background thread.
+
+    Ticks are scheduled on absolute times so the rate does not drift with
+    the time spent reading; ticks missed while a read was slow are skipped
+    rather than bunched up. Each sample is a dict of the source values plus
+    a `timestamp` in nanoseconds, handed to `sink`.
+    """
+    def __init__(self, sources, sink, rate_hz=10.0):
+        self.sources = sources
+        self.sink = sink
+        self.period_ns = int(1e9 / rate_hz)
+
+    def start(self, stop_event):
+        self.stop_event = stop_event
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def sample(self):
+        sample = {"timestamp": clock_ns()}
+        for name, read in self.sources.items():
+            sample[name] = read()
+        return sample
+
+    def _run(self):
+        next_tick = clock_ns()
+        try:
+            while not self.stop_event.is_set():
+                self.sink(self.sample())
+                next_tick += self.period_ns
+                now = clock_ns()
+                if now > next_tick:
+                    next_tick += (now - next_tick) // self.period_ns * self.period_ns + self.period_ns
+                self.stop_event.wait((next_tick - now) / 1e9)
+        finally:
+            self.close()
+
+    def close(self):
+        for source in self.sources.values():
+            if hasattr(source, "close"):
+                source.close()
+
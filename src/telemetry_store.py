@@ -0,0 +1,115 @@
+"""
+Columnar, preallocated store for telemetry samples
+"""
+import numpy as np
+
+
+class TelemetryStore:
+    """One preallocated NumPy column per metric plus a timestamp column.
+
+    A column is created on the first value of its metric that is not None,
+    earlier rows are NaN: scalars get a 1-d column, per-core lists a 2-d one
+    (shorter rows and missing values are NaN). A 1-d column becomes 2-d with
+    its values in the first position once the metric reports a list, e.g.
+    tegrastats per-core loads of cores that were off at startup, and 2-d
+    columns widen for longer lists. The store is written by a single
+    producer thread; a row is filled before the row count is published and
+    changed columns are published as a new dict, so readers never see a
+    partial row without any locking.
+
+    When all `capacity` rows are used, `overflow` decides what happens:
+    "downsample" keeps every other row and from then on stores only every
+    other sample, so a soak run of any length covers its whole duration in
+    flat memory; "ring" overwrites the oldest rows.
+    """
+    def __init__(self, capacity=65536, overflow="downsample"):
+        if overflow not in ["downsample", "ring"]:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected downsample/ring")
+        self.capacity = capacity
+        self.overflow = overflow
+        self.columns = {}
+        self.count = 0
+        self.stride = 1
+        self._seen = 0
+
+    def _allocate(self, name, value):
+        if name == "timestamp":
+            return np.zeros(self.capacity, dtype=np.int64)
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return np.full((self.capacity, len(value)), np.nan, dtype=np.float64)
+        return np.full(self.capacity, np.nan, dtype=np.float64)
+
+    def _fit(self, column, value):
+        """`column`, or a copy grown to hold `value`.
+        """
+        if not isinstance(value, (list, tuple, np.ndarray)) or column.dtype.kind != "f":
+            return column
+        if column.ndim == 1:
+            grown = np.full((self.capacity, max(len(value), 1)), np.nan, dtype=np.float64)
+            grown[:, 0] = column
+            return grown
+        if len(value) > column.shape[1]:
+            grown = np.full((self.capacity, len(value)), np.nan, dtype=np.float64)
+            grown[:, :column.shape[1]] = column
+            return grown
+        return column
+
+    def _write(self, row, sample):
+        columns = self.columns
+        for name, value in sample.items():
+            if value is None:
+                continue
+            column = columns.get(name)
+            fitted = self._allocate(name, value) if column is None else self._fit(column, value)
+            if fitted is not column:
+                columns = dict(columns)
+                columns[name] = fitted
+        self.columns = columns
+
+        for name, column in columns.items():
+            value = sample.get(name)
+            if value is None:
+                column[row] = np.nan if column.dtype.kind == "f" else 0
+            elif column.ndim == 2:
+                if not isinstance(value, (list, tuple, np.ndarray)):
+                    value = [value]
+                values = [np.nan if v is None else v for v in value[:column.shape[1]]]
+                column[row, :len(values)] = values
+                column[row, len(values):] = np.nan
+            else:
+                column[row] = value
+
+    def append(self, sample):
+        """Adds a sample dict, usable as the sink of a `TelemetrySampler`.
+        """
+        self._seen += 1
+        if (self._seen - 1) % self.stride:
+            return
+
+        if self.count < self.capacity:
+            self._write(self.count, sample)
+            self.count += 1
+        elif self.overflow == "ring":
+            self._write(self.count % self.capacity, sample)
+            self.count += 1
+        else:
+            half = self.capacity // 2
+            for column in self.columns.values():
+                column[:half] = column[0:2 * half:2]
+            self.stride *= 2
+            self._write(half, sample)
+            self.count = half + 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def snapshot(self):
+        """Copy of every column in time order, trimmed to the filled rows.
+        """
+        # the count first, columns it covers were published before it
+        count = self.count
+        columns = self.columns
+        if self.overflow == "ring" and count > self.capacity:
+            start = count % self.capacity
+            return {name: np.roll(column, -start, axis=0).copy() for name, column in columns.items()}
+        return {name: column[:count].copy() for name, column in columns.items()}
@@ -0,0 +1,129 @@
+"""
+Packed, memory-mapped tensor store for preprocessed datasets
+
+A store is a directory holding one contiguous array with every preprocessed
+sample (`data.npy`) and an index (`index.json`) with the image ids, labels
+and how many rows have been written so far.
+"""
+import os
+import json
+
+import numpy as np
+
+
+DATA_FILE = "data.npy"
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+
+
+def store_name(preprocess_func, size, dtype):
+    """Directory name of the store for a preprocess function, input size and dtype.
+    """
+    return f"{preprocess_func.__name__}_{size[0]}x{size[1]}_{np.dtype(dtype).name}"
+
+
+def _read_index(path):
+    index_path = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_path) or not os.path.exists(os.path.join(path, DATA_FILE)):
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get("version") != STORE_VERSION:
+        return None
+    return index
+
+
+def _write_index(path, index):
+    tmp_path = os.path.join(path, f"{INDEX_FILE}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(path, INDEX_FILE))
+
+
+class TensorStoreWriter:
+    """Appends samples to a store in order.
+
+    An existing store is reused when its ids start with the requested ids and
+    the sample shape and dtype match; writing then resumes after the last
+    flushed row.
+    """
+    def __init__(self, path, ids, labels, shape, dtype, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        shape = [int(dim) for dim in shape]
+        dtype = np.dtype(dtype).name
+
+        os.makedirs(path, exist_ok=True)
+        index = _read_index(path)
+        if index is not None and index["shape"] == shape and index["dtype"] == dtype \
+                and index["ids"][:len(ids)] == list(ids):
+            self.index = index
+            self.data = np.load(os.path.join(path, DATA_FILE), mmap_mode='r+')
+        else:
+            self.index = {
+                "version": STORE_VERSION,
+                "ids": list(ids),
+                "labels": [int(label) for label in labels],
+                "shape": shape,
+                "dtype": dtype,
+                "count": 0,
+            }
+            self.data = np.lib.format.open_memmap(
+                os.path.join(path, DATA_FILE), mode='w+', dtype=dtype, shape=(len(ids), *shape))
+            _write_index(path, self.index)
+        self.target = len(ids)
+
+    @property
+    def count(self):
+        return self.index["count"]
+
+    @property
+    def pending(self):
+        return max(0, self.target - self.count)
+
+    def append(self, array):
+        self.data[self.index["count"]] = array
+        self.index["count"] += 1
+        if self.index["count"] % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        # data before index, so the index never points at rows not on disk
+        self.data.flush()
+        _write_index(self.path, self.index)
+
+    def close(self):
+        self.flush()
+        del self.data
+
+
+class TensorStore:
+    """Read-only view over a store.
+
+    Samples and batches are slices of the memory-mapped array, so no copy or
+    per-sample file access happens while iterating.
+    """
+    def __init__(self, path, limit=None):
+        self.path = path
+        index = _read_index(path)
+        if index is None:
+            raise FileNotFoundError(f"No tensor store found in {path}.")
+        count = index["count"] if limit is None else min(limit, index["count"])
+        self.data = np.load(os.path.join(path, DATA_FILE), mmap_mode='r')[:count]
+        self.ids = index["ids"][:count]
+        self.labels = np.array(index["labels"][:count], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.ids[i], self.data[i], self.labels[i]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def batches(self, batch_size):
+        for start in range(0, len(self), batch_size):
+            end = start + batch_size
+            yield self.ids[start:end], self.data[start:end], self.labels[start:end]
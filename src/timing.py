@@ -0,0 +1,65 @@
+"""
+Shared high-resolution timing for backends
+
+Backends time the stages of a call as named spans on a monotonic
+nanosecond clock, so that breakdowns are comparable across frameworks.
+"""
+import time
+from contextlib import contextmanager
+
+
+SPANS = ["preprocess", "quantize", "copy_in", "invoke", "copy_out", "postprocess"]
+
+# spans that make up the inference time a backend returns from __call__
+INFER_SPANS = ["copy_in", "invoke", "copy_out"]
+
+
+def clock_ns():
+    """Monotonic clock shared by inference timings and telemetry samples.
+    """
+    return time.perf_counter_ns()
+
+
+class Timer:
+    """Collects durations of named spans.
+
+    `begin` starts a new call, the spans recorded after it are available
+    through `call_time` until the next `begin`; every duration is also kept
+    for the per-span summary. Any object with the same methods can be given
+    to `Backend.set_timer` instead, e.g. to forward spans to a tracer.
+    """
+    def __init__(self, clock=clock_ns):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.durations = {}
+        self._current = {}
+
+    def begin(self):
+        self._current = {}
+
+    def record(self, name, duration_ns):
+        self.durations.setdefault(name, []).append(duration_ns)
+        self._current[name] = self._current.get(name, 0) + duration_ns
+
+    @contextmanager
+    def span(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, self.clock() - start)
+
+    def call_time(self, spans=INFER_SPANS):
+        """Seconds spent in `spans` since the last `begin`.
+        """
+        return sum(self._current.get(name, 0) for name in spans) / 1e9
+
+    def summary(self):
+        """Mean duration of every recorded span in milliseconds.
+        """
+        return {
+            name: round(sum(durations) / len(durations) / 1e6, 4)
+            for name, durations in self.durations.items() if durations
+        }
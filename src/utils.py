@@ -4,17 +4,18 @@ import subprocess
 import re
 import threading
 import json
-import cv2
-import psutil
 import numpy as np
-from torchvision import transforms
-from PIL import Image
 
-import metrics
+from timing import clock_ns
 
 
 
+# cv2, PIL and torchvision are imported by the functions using them, so that
+# importing utils does not load them for backends that never need them
+
 def preprocess_img(filename, size=(224,224)):
+    from PIL import Image
+    from torchvision import transforms
     input_image = Image.open(filename)
     if input_image.mode != 'RGB':
         input_image = input_image.convert('RGB')
@@ -38,7 +39,10 @@ def center_crop(img, out_height, out_width):
     return img
 
 
-def resize_with_aspectratio(img, out_height, out_width, scale=87.5, inter_pol=cv2.INTER_LINEAR):
+def resize_with_aspectratio(img, out_height, out_width, scale=87.5, inter_pol=None):
+    import cv2
+    if inter_pol is None:
+        inter_pol = cv2.INTER_LINEAR
     height, width, _ = img.shape
     new_height = int(100. * out_height / scale)
     new_width = int(100. * out_width / scale)
@@ -53,6 +57,7 @@ def resize_with_aspectratio(img, out_height, out_width, scale=87.5, inter_pol=cv
 
 
 def preprocess_tflite_resnet(img, size=(224,224)):
+    import cv2
     img = cv2.imread(img)
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     img = resize_with_aspectratio(img, 224, 224, inter_pol=cv2.INTER_LINEAR)
@@ -66,6 +71,7 @@ def preprocess_tflite_resnet(img, size=(224,224)):
 
 
 def preprocess_tflite_mobilenet(img, size=(224, 224)):
+    import cv2
     img = cv2.imread(img)
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     img = resize_with_aspectratio(img, size[0], size[0], inter_pol=cv2.INTER_LINEAR)
@@ -110,18 +116,45 @@ def extract_tegrastats_info(output):
     return ram_usage, cpu_utilization, gpu_utilisation, temperature, cpu_freq
 
 
-def read_tegrastats_output(process, output_queue, stop_event):
+def read_tegrastats_output(process, sink, stop_event):
     while not stop_event.is_set():
         output = process.stdout.readline()
         if not output:
             break
+        timestamp = clock_ns()
         ram_usage, cpu_utilization, gpu_utilization, temperature, cpu_freq = extract_tegrastats_info(output.decode().strip())
         if ram_usage is not None or cpu_utilization is not None or \
          gpu_utilization is not None or temperature is not None:
-            output_queue.put((ram_usage, cpu_utilization, gpu_utilization, temperature, cpu_freq))
+            sink({
+                "timestamp": timestamp,
+                "memory": ram_usage,
+                "cpu": cpu_utilization,
+                "gpu_util": gpu_utilization,
+                "temperature": temperature,
+                "cpu_freq": cpu_freq,
+            })
     process.terminate()
 
 
+def start_tegrastats(sink, stop_event, interval_ms=1000):
+    """Starts tegrastats and a thread feeding its parsed samples to `sink`.
+    Returns:
+        the tegrastats process and the reader thread
+    """
+    process = subprocess.Popen(
+        ['tegrastats', '--interval', str(int(interval_ms))],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    thread = threading.Thread(
+        target=read_tegrastats_output,
+        args=(process, sink, stop_event),
+        daemon=True
+    )
+    thread.start()
+    return process, thread
+
+
 def parse_lscpu_output(output):
     data = {}
     lines = output.decode().splitlines() \
@@ -154,54 +187,6 @@ def get_device_model():
     except FileNotFoundError:
         return None
 
-def build_and_run_device_query():
-    # Change the directory to /usr/local/cuda/samples/1_Utilities/deviceQuery
-    cuda_dir = "/usr/local/cuda/samples/1_Utilities/deviceQuery"
-    current_dir = os.getcwd()
-    os.chdir(cuda_dir)
-
-    try:
-        # Run 'make' command to build the deviceQuery binary
-        subprocess.run(["make"], check=True)
-
-        # Run the deviceQuery command
-        result = subprocess.run(["./deviceQuery"], stdout=subprocess.PIPE, universal_newlines=True, check=True)
-        os.chdir(current_dir)
-
-        # Get the output
-        output = result.stdout
-
-        # Find the line that contains the device name
-        device_line = [line for line in output.splitlines() if "Device 0:" in line]
-        if device_line:
-            device_name = device_line[0].split(": ")[1].strip('"')
-            return device_name
-        else:
-            return "Device not found in the output."
-    except FileNotFoundError:
-        return "deviceQuery or make command not found in the specified CUDA directory."
-    
-
-
-def get_coral_stats(output_queue, stop_event):
-    while not stop_event.is_set():
-        tpu_freq = metrics.handle_coral_dev_board_tpu_freq()[0]
-        cpu_freq = metrics.handle_coral_dev_board_cpu_freq()
-        temp = metrics.handle_coral_dev_board_temp()[0]
-        cpu_usage = metrics.get_cpu_usage()
-        ram_usage = metrics.get_memory_usage()[0]
-        output_queue.put((cpu_usage, ram_usage, temp, tpu_freq, cpu_freq))
-    
-
-def get_stats_rockpi(output_queue, stop_event):
-    while not stop_event.is_set():
-        cpu_freq = metrics.handle_firefly_rk3399_cpu_freq()
-        cpu_usage = metrics.get_cpu_usage()
-        ram_usage = metrics.get_memory_usage()[0]
-        temp = np.sum(metrics.handle_firefly_rk3399_temp())/2
-        output_queue.put((cpu_usage, ram_usage, temp/1000, cpu_freq))
-
-
 def parse_power_response(response, bus_id=None):
     if bus_id is None:
         raise ValueError("bus_id is None.")
@@ -229,20 +214,28 @@ def download_model(model_name, backend, precision=None, device=None, download_pa
             raise ValueError("precision is none.")
 
         model_link = models_dict[backend][f"{model_name}_{precision}"]
+    elif backend == "ncnn":
+        entry = models_dict[backend].get(model_name, {})
+        if entry.get("param") and entry.get("bin"):
+            model_link = [entry["param"], entry["bin"]]
 
-    if model_link is None:
+    if not model_link:
         raise ValueError("Model link not found in the models dictionary.")
 
     download_path = os.path.expanduser(download_path)
 
     os.makedirs(download_path, exist_ok=True)
-    model_filename = os.path.basename(model_link)
-
-    model_path = os.path.join(download_path, model_filename)
-
-    wget_command = f"wget -O {model_path} {model_link}"
-    try:
-        subprocess.run(wget_command, shell=True, check=True)
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Failed to download model using wget. Error: {e}")
-    return model_path
\ No newline at end of file
+    model_paths = []
+    for link in model_link if isinstance(model_link, list) else [model_link]:
+        model_path = os.path.join(download_path, os.path.basename(link))
+
+        wget_command = f"wget -O {model_path} {link}"
+        try:
+            subprocess.run(wget_command, shell=True, check=True)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to download model using wget. Error: {e}")
+        model_paths.append(model_path)
+    if backend == "ncnn":
+        # the .param and .bin files are passed on as their common prefix
+        return os.path.splitext(model_paths[0])[0]
+    return model_paths[0]
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+
+import device_profiles
+
+
+def write_model(procfs_root, model):
+    os.makedirs(os.path.join(procfs_root, "device-tree"))
+    with open(os.path.join(procfs_root, "device-tree", "model"), 'w') as f:
+        f.write(model + "\x00")
+
+
+def test_load_profile_reads_the_model_under_procfs_root(tmp_path):
+    write_model(str(tmp_path), "Radxa ROCK Pi 4B")
+    assert device_profiles.read_device_model(str(tmp_path)) == "Radxa ROCK Pi 4B"
+    assert device_profiles.load_profile(procfs_root=str(tmp_path)).name == \
+        device_profiles.load_profile(model="Radxa ROCK Pi 4B").name != \
+        device_profiles.load_profile(model="").name
+
+
+def test_missing_device_tree_falls_back_to_the_default(tmp_path):
+    assert device_profiles.read_device_model(str(tmp_path)) is None
+    assert device_profiles.load_profile(procfs_root=str(tmp_path)).name == \
+        device_profiles.load_profile(model="").name
+
+
+def write(root, path, value):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(f"{value}\n")
+
+
+def close(sources):
+    for name, source in sources.items():
+        if name != "memory":
+            source.close()
+
+
+def fake_board(root, trip_points=3):
+    sysfs, procfs = os.path.join(root, "sys"), os.path.join(root, "proc")
+    # cpu10 sorts after cpu2, cpu1 has no cpufreq (offline core)
+    for core, khz in [(0, 408000), (2, 1416000), (10, 1800000)]:
+        write(sysfs, f"devices/system/cpu/cpu{core}/cpufreq/scaling_cur_freq", khz)
+    os.makedirs(os.path.join(sysfs, "devices/system/cpu/cpu1"))
+    write(sysfs, "class/thermal/thermal_zone0/temp", 40000)
+    os.makedirs(os.path.join(sysfs, "class/thermal/thermal_zone1"))
+    write(sysfs, "class/thermal/thermal_zone2/temp", 50000)
+    write(sysfs, "class/devfreq/ff9a0000.gpu/cur_freq", 800000000)
+    write(sysfs, "class/devfreq/dmc/cur_freq", 856000000)
+    for i, temp in enumerate([85000, 90000, 95000][:trip_points]):
+        write(sysfs, f"class/apex/apex_0/trip_point{i}_temp", temp)
+    write(procfs, "stat", "cpu  4 0 4 8 0 0 0\ncpu0 2 0 2 4 0 0 0\ncpu1 2 0 2 4 0 0 0")
+    return sysfs, procfs
+
+
+def test_discover_fake_tree(tmp_path):
+    sysfs, procfs = fake_board(str(tmp_path))
+    nodes = device_profiles.discover(sysfs_root=sysfs, procfs_root=procfs)
+    assert [path.split(os.sep)[-3] for path in nodes["cpu_freq"]] == ["cpu0", "cpu2", "cpu10"]
+    assert sorted(nodes["thermal_zones"]) == [0, 2]
+    assert [os.path.basename(os.path.dirname(path)) for path in nodes["gpu_freq"]] == ["ff9a0000.gpu"]
+    assert nodes["apex"] == [os.path.join(sysfs, "class", "apex", "apex_0")]
+    assert nodes["cpu_stat"] == os.path.join(procfs, "stat")
+
+
+def test_discover_empty_tree(tmp_path):
+    nodes = device_profiles.discover(sysfs_root=str(tmp_path), procfs_root=str(tmp_path))
+    assert nodes == {"cpu_freq": [], "thermal_zones": {}, "gpu_freq": [], "apex": [], "cpu_stat": None}
+    sources = device_profiles.DeviceProfile("empty").build_sources(str(tmp_path), str(tmp_path))
+    assert list(sources) == ["memory"]
+
+
+def test_build_sources_reads_the_fake_tree(tmp_path):
+    sysfs, procfs = fake_board(str(tmp_path))
+    profile = device_profiles.DeviceProfile("coral", thermal_zones=[0, 1, 2], tpu_thermal_zone=0)
+    sources = profile.build_sources(sysfs_root=sysfs, procfs_root=procfs)
+    try:
+        assert sources["cpu_freq"]() == [408.0, 1416.0, 1800.0]
+        assert sources["gpu_freq"]() == [800.0]
+        # zone 1 has no temp node and is left out of the mean
+        assert sources["temperature"]() == 45.0
+        # 40 C is below every trip point
+        assert sources["tpu_freq"]() == 500.0
+        assert sources["cpu"]() == [0.0, 0.0]
+    finally:
+        close(sources)
+
+
+def test_apex_with_missing_trip_points_is_skipped(tmp_path):
+    sysfs, procfs = fake_board(str(tmp_path), trip_points=1)
+    assert device_profiles.discover(sysfs_root=sysfs, procfs_root=procfs)["apex"] == []
+    sources = device_profiles.DeviceProfile("coral").build_sources(sysfs_root=sysfs, procfs_root=procfs)
+    close(sources)
+    assert "tpu_freq" not in sources and "temperature" in sources
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import requests
+
+import metrics
+from energy import EnergyMeter
+
+
+def meter_with_phases():
+    meter = EnergyMeter(bus_id=3)
+    meter.phases = {"idle": (0, 1_000_000_000), "inference": (1_000_000_000, 3_000_000_000)}
+    return meter
+
+
+def test_phase_energy():
+    meter = meter_with_phases()
+    meter.timestamps = np.arange(0, 3_000_000_001, 500_000_000, dtype=np.int64)
+    # 1 W while idle, 3 W during inference, in the mW the server reports
+    meter.power = np.where(meter.timestamps <= 1_000_000_000, 1000.0, 3000.0)
+    meter.power[2] = 1000.0
+    report = meter.report(inferences=100)
+    assert report["phases"]["idle"]["power_w"] == 1.0
+    assert report["inference_power_w"] == 2.6
+    assert report["energy_per_inference_j"] == round(2.6 * 2 / 100, 6)
+    assert report["dynamic_energy_per_inference_j"] == round(1.6 * 2 / 100, 6)
+
+
+def test_no_samples_reports_null():
+    meter = meter_with_phases()
+    report = meter.report(inferences=100)
+    assert meter.phase_power("inference") is None
+    assert report["phases"]["inference"]["energy_j"] is None
+    assert report["energy_per_inference_j"] is None
+    # valid JSON, without NaN
+    json.dumps(report, allow_nan=False)
+
+
+def test_unreachable_power_server_reports_null(monkeypatch):
+    gets = []
+
+    def get(url, timeout=None):
+        gets.append((url, timeout))
+        raise requests.ConnectionError("connection refused")
+    monkeypatch.setattr(requests, "get", get)
+
+    meter = EnergyMeter(bus_id=3, server_url="http://power", timeout=2.0)
+    meter.start()
+    with meter.phase("inference"):
+        pass
+    assert len(meter.stop()) == 0
+    # power-stop is not asked for samples of a measurement that never started
+    assert gets == [("http://power/power-start", 2.0)]
+    assert meter.report(inferences=10)["inference_power_w"] is None
+
+
+def test_failed_power_stop_reports_null(monkeypatch):
+    monkeypatch.setattr(metrics, "start_PAC1931", lambda server_url, timeout: {})
+
+    def stop(server_url, timeout):
+        raise requests.Timeout("read timed out")
+    monkeypatch.setattr(metrics, "stop_PAC1931", stop)
+
+    meter = EnergyMeter(bus_id=3)
+    meter.start()
+    with meter.phase("inference"):
+        pass
+    assert len(meter.stop()) == 0
+    assert meter.phase_power("inference") is None
@@ -0,0 +1,30 @@
+import numpy as np
+
+import latency_stats
+
+
+def test_histogram_percentiles_within_its_relative_error():
+    rng = np.random.default_rng(0)
+    latencies = rng.lognormal(np.log(0.005), 0.5, size=10000)
+    histogram = latency_stats.LatencyHistogram(precision_bits=7)
+    histogram.record(latencies[:5000])
+    histogram.record(latencies[5000:])
+    assert histogram.total == latencies.size
+    for q in [50, 90, 99, 99.9]:
+        exact = np.percentile(latencies, q) * 1000
+        assert abs(histogram.percentile(q) - exact) / exact < 2 ** -6 + 1e-3
+    assert histogram.percentile(100) == round(latencies.max() * 1e6) / 1000
+
+
+def test_histogram_to_dict_is_sparse():
+    histogram = latency_stats.LatencyHistogram()
+    histogram.record([0.000010, 0.000010, 0.5])
+    data = histogram.to_dict()
+    assert data["counts"] == [2, 1] and data["buckets"][0] == 10
+
+
+def test_summarize():
+    summary = latency_stats.summarize([0.001, 0.002, 0.003, 0.004])
+    assert summary["count"] == 4
+    assert summary["max"] == 4.0
+    assert latency_stats.summarize([]) == {"count": 0}
@@ -0,0 +1,49 @@
+import time
+import threading
+
+import numpy as np
+
+from loader import PrefetchLoader
+
+
+class Dataset:
+    def __init__(self, count, fail_after=None):
+        self.count = count
+        self.fail_after = fail_after
+
+    def __len__(self):
+        return self.count
+
+    def batches(self, batch_size):
+        for start in range(0, self.count, batch_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise RuntimeError("read failed")
+            ids = list(range(start, min(start + batch_size, self.count)))
+            yield ids, np.zeros((len(ids), 2), dtype=np.float32), ids
+
+
+def test_batches_in_order():
+    batches = list(PrefetchLoader(Dataset(10), depth=2, batch_size=4))
+    assert [ids for ids, _, _ in batches] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_early_stop_releases_a_blocked_producer():
+    threads = set(threading.enumerate())
+    loader = iter(PrefetchLoader(Dataset(2), depth=1))
+    next(loader)
+    producers = set(threading.enumerate()) - threads
+    # the last batch fills the queue and the producer blocks on the end
+    # marker, close has to release it
+    time.sleep(0.2)
+    loader.close()
+    assert producers and not any(thread.is_alive() for thread in producers)
+
+
+def test_errors_reach_the_consumer():
+    loader = PrefetchLoader(Dataset(10, fail_after=2), depth=1)
+    try:
+        list(loader)
+    except RuntimeError as e:
+        assert str(e) == "read failed"
+    else:
+        raise AssertionError("the producer error was not raised")
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from preprocess_cache import cache_key
+
+
+def preprocess(path, size=(224, 224)):
+    return np.zeros((3,) + tuple(size), dtype=np.float32)
+
+
+def preprocess_other(path, size=(224, 224)):
+    return np.ones((3,) + tuple(size), dtype=np.float32)
+
+
+def make_images(directory, count=3):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"ILSVRC2012_val_{i:08d}.JPEG")
+        with open(path, 'wb') as f:
+            f.write(b"\xff\xd8" + bytes([i]) * 16)
+        paths.append(path)
+    return paths
+
+
+def key(paths, func=preprocess, size=(224, 224), dtype=np.float32, params=None):
+    return cache_key(func, size, (3,) + size, dtype, source=os.path.dirname(paths[0]), params=params, files=paths)
+
+
+def test_key_is_stable(tmp_path):
+    paths = make_images(str(tmp_path))
+    assert key(paths) == key(list(reversed(paths)))
+
+
+def test_key_changes_with_the_inputs(tmp_path):
+    paths = make_images(str(tmp_path))
+    base = key(paths)
+    assert key(paths, func=preprocess_other) != base
+    assert key(paths, size=(299, 299)) != base
+    assert key(paths, dtype=np.uint8) != base
+    assert key(paths, params={"quantization": {"scale": [0.5]}}) != base
+    assert key(paths[:2]) != base
+
+
+def test_key_changes_when_an_image_is_replaced(tmp_path):
+    paths = make_images(str(tmp_path))
+    base = key(paths)
+    stat = os.stat(paths[1])
+    with open(paths[1], 'wb') as f:
+        f.write(b"\xff\xd8" + b"\x07" * 16)
+    # same name and size, only the modification time differs
+    os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert key(paths) != base
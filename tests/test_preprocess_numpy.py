@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import preprocess_numpy
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def pillow_resize_crop(rgb, size):
+    """torchvision's Resize(size) -> CenterCrop(size) on a PIL image.
+    """
+    image = Image.fromarray(rgb)
+    width, height = image.size
+    new_height, new_width = preprocess_numpy.resized_size(height, width, size)
+    resized = np.asarray(image.resize((new_width, new_height), Image.BILINEAR))
+    top = int(round((new_height - size) / 2.0))
+    left = int(round((new_width - size) / 2.0))
+    return resized[top:top + size, left:left + size]
+
+
+@pytest.mark.parametrize("height, width", [(375, 500), (500, 333), (224, 224), (120, 90), (1024, 768)])
+def test_resize_matches_pillow_exactly(height, width):
+    rgb = np.random.default_rng(height * width).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    preprocessor = preprocess_numpy.ImagePreprocessor(224)
+    np.testing.assert_array_equal(preprocessor.resize_crop(rgb), pillow_resize_crop(rgb, 224))
+
+
+def test_normalization():
+    rgb = np.random.default_rng(1).integers(0, 256, size=(300, 400, 3), dtype=np.uint8)
+    preprocessor = preprocess_numpy.ImagePreprocessor(224)
+    pixels = pillow_resize_crop(rgb, 224).transpose(2, 0, 1).astype(np.float32) / np.float32(255)
+    expected = (pixels - preprocessor.mean) / preprocessor.std
+    out = np.empty((3, 224, 224), dtype=np.float32)
+    assert preprocessor.from_rgb(rgb, out=out) is out
+    np.testing.assert_allclose(out, expected, rtol=0, atol=1e-6)
@@ -0,0 +1,42 @@
+import numpy as np
+
+import hardware
+from preprocessing import PreprocessEngine, QuantizedPreprocess, quantize
+
+
+def test_round_half_away_from_zero():
+    values = np.array([-1.5, -0.5, 0.5, 1.5, 2.4, 2.6], dtype=np.float32)
+    np.testing.assert_array_equal(quantize(values, 1.0, 0, np.int8), [-2, -1, 1, 2, 2, 3])
+
+
+def test_saturation():
+    values = np.array([-1000.0, -129.0, 127.4, 1000.0], dtype=np.float32)
+    np.testing.assert_array_equal(quantize(values, 1.0, 0, np.int8), [-128, -128, 127, 127])
+    np.testing.assert_array_equal(quantize(values, 1.0, 128, np.uint8), [0, 0, 255, 255])
+
+
+def test_scale_and_zero_point_per_channel():
+    values = np.array([[1.0, 1.0, 1.0]], dtype=np.float32)
+    quantized = quantize(values, [0.5, 0.25, 1.0], [10, 0, -5], np.int8)
+    np.testing.assert_array_equal(quantized, [[12, 4, -4]])
+    assert quantized.dtype == np.int8
+
+
+def preprocess_ones(jpeg_path, size=(224, 224)):
+    return np.ones((size[0], size[1], 3), dtype=np.float32)
+
+
+def test_quantized_preprocess():
+    func = QuantizedPreprocess(preprocess_ones, scale=[0.0078125], zero_point=[-128], dtype="int8")
+    assert func.__name__ == "preprocess_ones_quantized" and func.func is preprocess_ones
+    out = func("unused.JPEG", size=(2, 2))
+    assert out.dtype == np.int8 and out.shape == (2, 2, 3)
+    assert (out == 0).all()
+
+
+def test_in_process_preprocessing_keeps_the_backend_pinned(monkeypatch):
+    unpinned = []
+    monkeypatch.setattr(hardware, "unpin", lambda: unpinned.append(True))
+    engine = PreprocessEngine(lambda path, size: np.full(size, len(path)), size=(2, 2), workers=1)
+    assert [int(out[0, 0]) for out in engine._imap(["a", "bb"])] == [1, 2]
+    assert unpinned == []
@@ -0,0 +1,111 @@
+import requests
+
+from results_sink import Outbox, ResultsUploader, json_safe
+from telemetry_store import TelemetryStore
+
+
+def test_pending_until_acknowledged(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    benchmark = outbox.append("benchmark", {"model_name": "resnet50"})
+    metric = outbox.append("metric", {"latency_stats": {}}, parent=benchmark)
+    assert [record["id"] for record in outbox.pending()] == [benchmark, metric]
+
+    outbox.ack(benchmark, benchmark_id=42)
+    assert [record["id"] for record in outbox.pending()] == [metric]
+    assert outbox.acks() == {benchmark: 42}
+    # a new process sees the same journal
+    assert [record["id"] for record in Outbox(str(tmp_path)).pending()] == [metric]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    record = outbox.append("benchmark", {"accuracy": 70.0})
+    with open(outbox.records_path, 'a') as f:
+        f.write('{"id": "interrupted", "kind": "metr')
+    assert [entry["id"] for entry in outbox.pending()] == [record]
+
+
+def test_missing_telemetry_sample_serializes(tmp_path):
+    store = TelemetryStore(capacity=8)
+    store.append({"timestamp": 1, "temperature": 40.0, "cpu": [10.0, 20.0]})
+    store.append({"timestamp": 2, "temperature": None, "cpu": [30.0]})
+    stats = store.snapshot()
+    payload = {
+        "temperature": stats["temperature"].tolist(),
+        "cpu_usage": stats["cpu"].tolist(),
+        "memory": float("nan"),
+    }
+
+    outbox = Outbox(str(tmp_path))
+    outbox.append("metric", payload)
+    record = outbox.pending()[0]
+    assert record["payload"] == {"temperature": [40.0, None], "cpu_usage": [[10.0, 20.0], [30.0, None]], "memory": None}
+    # what the uploader sends, requests refuses NaN with InvalidJSONError
+    requests.Request("POST", "http://localhost/bench/insert_metric", json=record["payload"]).prepare()
+    assert json_safe({"power": (1.0, float("inf"))}) == {"power": [1.0, None]}
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class Session:
+    def __init__(self, benchmark_id=7, error=None):
+        self.benchmark_id = benchmark_id
+        self.error = error
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url, json))
+        if self.error is not None:
+            raise self.error
+        return Response({"benchmark_id": self.benchmark_id})
+
+
+def uploader(outbox, session):
+    uploader = ResultsUploader(outbox, "http://localhost", backoff=0.0)
+    uploader.session = session
+    return uploader
+
+
+def test_metric_of_a_benchmark_without_id_fails(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    benchmark = outbox.append("benchmark", {"accuracy": 70.0})
+    metric = outbox.append("metric", {"latency_stats": {}}, parent=benchmark)
+    session = Session(benchmark_id=None)
+
+    assert uploader(outbox, session).upload_pending() == 1
+    assert len(session.posts) == 1
+    assert outbox.pending() == []
+    assert "without a benchmark_id" in outbox.failed()[metric]
+
+
+def test_unserializable_record_fails_without_retries(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    # written by a version before json_safe
+    outbox._append(outbox.records_path, {
+        "id": "nan", "kind": "benchmark", "parent": None, "created": 0.0, "payload": {"cpu": float("nan")}})
+    good = outbox.append("benchmark", {"cpu": 1.0})
+    session = Session()
+
+    assert uploader(outbox, session).upload_pending() == 1
+    assert [payload for _, payload in session.posts] == [{"cpu": 1.0}]
+    assert outbox.acks() == {"nan": None, good: 7}
+    assert set(outbox.failed()) == {"nan"}
+
+
+def test_invalid_json_error_is_not_retried(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    record = outbox.append("benchmark", {"accuracy": 70.0})
+    session = Session(error=requests.exceptions.InvalidJSONError("Out of range float values"))
+
+    assert uploader(outbox, session).upload_pending() == 0
+    assert len(session.posts) == 1
+    assert outbox.pending() == [] and record in outbox.failed()
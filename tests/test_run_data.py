@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+import run_data
+from run_data import RunData, write_run_data
+
+
+def test_round_trip(tmp_path):
+    columns = {
+        "telemetry/cpu": np.array([[1.0, 2.0], [np.nan, 4.0]]),
+        "telemetry/timestamp": np.array([10, 20], dtype=np.int64),
+        "latency/seconds": np.array([0.01, 0.02, 0.03]),
+    }
+    path = write_run_data(str(tmp_path / "fp32_results_stats"), columns, meta={"phases": {"idle": [0, 1]}})
+    assert path.endswith(".npz")
+
+    data = RunData.load(path)
+    assert data.schema_version == run_data.SCHEMA_VERSION
+    assert data.meta["phases"] == {"idle": [0, 1]}
+    for name, column in columns.items():
+        np.testing.assert_array_equal(data[name], column)
+        assert data[name].dtype == column.dtype
+    assert set(data.group("telemetry")) == {"cpu", "timestamp"}
+    assert "power/value" not in data
+    assert data.to_dict()["latency/seconds"] == [0.01, 0.02, 0.03]
+
+
+def test_newer_schema_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_data, "SCHEMA_VERSION", run_data.SCHEMA_VERSION + 1)
+    path = write_run_data(str(tmp_path / "stats"), {"latency/seconds": [0.1]})
+    monkeypatch.undo()
+    with pytest.raises(ValueError):
+        RunData.load(path)
@@ -0,0 +1,23 @@
+import main
+from scenarios import make_scenario
+
+
+def parse(*argv):
+    return main.build_parser().parse_args(["--input_size", "224,224", *argv])
+
+
+def test_default_is_single_stream_per_query():
+    scenario = make_scenario(parse())
+    assert scenario.name == "single-stream"
+    assert scenario.latency_unit == "query"
+
+
+def test_offline_latency_is_per_batch(capsys):
+    scenario = make_scenario(parse("--scenario", "offline", "--batch-size", "8"))
+    assert scenario.latency_unit == "batch"
+    assert "WARN" not in capsys.readouterr().out
+
+
+def test_single_stream_warns_about_an_unused_batch_size(capsys):
+    make_scenario(parse("--batch-size", "8"))
+    assert "--scenario offline" in capsys.readouterr().out
@@ -0,0 +1,57 @@
+import numpy as np
+
+from telemetry_store import TelemetryStore
+
+
+def sample(t, **metrics):
+    return dict(timestamp=t, **metrics)
+
+
+def test_scalar_and_list_columns():
+    store = TelemetryStore(capacity=8)
+    store.append(sample(1, gpu=10.0, cpu=[1.0, 2.0]))
+    store.append(sample(2, gpu=None, cpu=[3.0]))
+    data = store.snapshot()
+    np.testing.assert_array_equal(data["timestamp"], [1, 2])
+    np.testing.assert_array_equal(data["gpu"], [10.0, np.nan])
+    np.testing.assert_array_equal(data["cpu"], [[1.0, 2.0], [3.0, np.nan]])
+
+
+def test_column_created_on_first_value():
+    # tegrastats reports cores that are off as None at startup
+    store = TelemetryStore(capacity=8)
+    store.append(sample(1, cpu=None))
+    store.append(sample(2, cpu=[1.0, None, 3.0]))
+    store.append(sample(3, cpu=[4.0, 5.0, 6.0], ram=7.0))
+    data = store.snapshot()
+    np.testing.assert_array_equal(data["cpu"], [[np.nan] * 3, [1.0, np.nan, 3.0], [4.0, 5.0, 6.0]])
+    np.testing.assert_array_equal(data["ram"], [np.nan, np.nan, 7.0])
+
+
+def test_scalar_column_becomes_list_column():
+    store = TelemetryStore(capacity=8)
+    store.append(sample(1, cpu=5.0))
+    store.append(sample(2, cpu=[1.0, 2.0]))
+    store.append(sample(3, cpu=[1.0, 2.0, 3.0]))
+    data = store.snapshot()
+    np.testing.assert_array_equal(
+        data["cpu"], [[5.0, np.nan, np.nan], [1.0, 2.0, np.nan], [1.0, 2.0, 3.0]])
+
+
+def test_downsample_keeps_the_whole_run_in_flat_memory():
+    store = TelemetryStore(capacity=8, overflow="downsample")
+    for t in range(32):
+        store.append(sample(t, gpu=float(t)))
+    data = store.snapshot()
+    assert len(store) <= 8
+    assert data["timestamp"][0] == 0 and data["timestamp"][-1] >= 24
+    # evenly spaced rows, in time order
+    assert len(set(np.diff(data["timestamp"]))) == 1
+    np.testing.assert_array_equal(data["gpu"], data["timestamp"].astype(np.float64))
+
+
+def test_ring_keeps_the_latest_rows():
+    store = TelemetryStore(capacity=4, overflow="ring")
+    for t in range(10):
+        store.append(sample(t, gpu=float(t)))
+    np.testing.assert_array_equal(store.snapshot()["timestamp"], [6, 7, 8, 9])
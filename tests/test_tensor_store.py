@@ -0,0 +1,65 @@
+import numpy as np
+
+import tensor_store
+from preprocessing import PreprocessEngine
+
+
+IDS = [f"img{i}" for i in range(5)]
+LABELS = list(range(5))
+
+
+def sample(i):
+    return np.full((2, 3), i, dtype=np.float32)
+
+
+def writer(path, ids=IDS):
+    return tensor_store.TensorStoreWriter(path, ids, LABELS[:len(ids)], (2, 3), np.float32, flush_every=2)
+
+
+def test_resume_after_the_last_flushed_row(tmp_path):
+    path = str(tmp_path)
+    first = writer(path)
+    for i in range(3):
+        first.append(sample(i))
+    # interrupted: only the rows up to the last flush (every 2) are on disk
+    del first
+
+    resumed = writer(path)
+    assert resumed.count == 2 and resumed.pending == 3
+    for i in range(resumed.count, len(IDS)):
+        resumed.append(sample(i))
+    resumed.close()
+
+    store = tensor_store.TensorStore(path)
+    assert store.ids == IDS
+    np.testing.assert_array_equal(store.data, np.stack([sample(i) for i in range(5)]))
+    np.testing.assert_array_equal(store.labels, LABELS)
+
+
+def test_a_different_layout_starts_over(tmp_path):
+    path = str(tmp_path)
+    first = writer(path)
+    first.append(sample(0))
+    first.close()
+    assert tensor_store.TensorStoreWriter(path, IDS, LABELS, (3, 2), np.float32).count == 0
+    assert writer(path, ids=["other"] + IDS[1:]).count == 0
+
+
+def test_engine_reports_resume_and_reuse(tmp_path, capsys):
+    path = str(tmp_path)
+    # one worker preprocesses in-process
+    engine = PreprocessEngine(lambda jpeg_path, size: sample(int(jpeg_path[3:])), workers=1)
+
+    partial = writer(path)
+    partial.append(sample(0))
+    partial.append(sample(1))
+    partial.flush()
+    result = engine.run(IDS, writer(path))
+    assert (result["processed"], result["skipped"]) == (3, 2)
+    assert "Resuming preprocessing, 2 images" in capsys.readouterr().out
+
+    result = engine.run(IDS, writer(path))
+    assert (result["processed"], result["skipped"]) == (0, 5)
+    output = capsys.readouterr().out
+    assert "Resuming" not in output and "Reusing the preprocessed store" in output
+    np.testing.assert_array_equal(tensor_store.TensorStore(path).data[4], sample(4))
@@ -0,0 +1,245 @@
+import sys
+import types
+import importlib
+
+import numpy as np
+import pytest
+
+import hardware
+
+
+# The fake cuda layer runs every operation when its stream is synchronized,
+# like the gpu it reads a pinned host buffer only then, so a host buffer
+# rewritten while its batch is in flight shows up as a wrong result.
+class FakeCuda:
+    def __init__(self):
+        self.clock = 0.0
+        self.streams = {}
+        self.memory = {}
+        self.max_in_flight = 0
+
+    def tick(self):
+        self.clock += 1.0
+        return self.clock
+
+    def in_flight(self):
+        return sum(1 for stream in self.streams.values() if stream.ops)
+
+
+class Stream:
+    def __init__(self, fake):
+        self.fake = fake
+        self.ops = []
+        self.handle = len(fake.streams) + 1
+        fake.streams[self.handle] = self
+
+    def synchronize(self):
+        ops, self.ops = self.ops, []
+        for op in ops:
+            op()
+
+
+class Event:
+    def __init__(self, fake):
+        self.fake = fake
+        self.time = None
+
+    def record(self, stream):
+        def op():
+            self.time = self.fake.tick()
+        stream.ops.append(op)
+
+    def time_till(self, end):
+        return end.time - self.time
+
+
+class Context:
+    """Computes output[i] = sum(input[i]) * [1, 2, 3, 4] for the bindings of
+    its optimization profile.
+    """
+    def __init__(self, fake, engine):
+        self.fake = fake
+        self.engine = engine
+        self.profile = 0
+        self.batch = None
+
+    def set_optimization_profile_async(self, profile, handle):
+        self.profile = profile
+
+    def set_binding_shape(self, index, shape):
+        assert index == 2 * self.profile
+        self.batch = shape[0]
+
+    def execute_async_v2(self, bindings, stream_handle):
+        assert self.batch is not None, "dynamic batch without a binding shape"
+        self._execute(self.batch, bindings, stream_handle)
+
+    def execute_async(self, batch_size, bindings, stream_handle):
+        self._execute(batch_size, bindings, stream_handle)
+
+    def _execute(self, batch, bindings, stream_handle):
+        fake = self.fake
+        src = fake.memory[bindings[2 * self.profile]]
+        dst = fake.memory[bindings[2 * self.profile + 1]]
+
+        def op():
+            inputs = src[:batch * 12].reshape(batch, 12)
+            dst[:batch * 4] = (inputs.sum(axis=1, keepdims=True) * np.arange(1, 5)).reshape(-1)
+        fake.streams[stream_handle].ops.append(op)
+        fake.max_in_flight = max(fake.max_in_flight, fake.in_flight())
+
+
+class Engine:
+    def __init__(self, fake, profiles=1, implicit_batch=False, max_batch_size=8):
+        self.fake = fake
+        self.num_optimization_profiles = profiles
+        self.num_bindings = 2 * profiles
+        self.has_implicit_batch_dimension = implicit_batch
+        self.max_batch_size = max_batch_size
+
+    def get_binding_shape(self, index):
+        sample = (3, 2, 2) if self.binding_is_input(index) else (4,)
+        return sample if self.has_implicit_batch_dimension else (-1, *sample)
+
+    def get_binding_dtype(self, index):
+        return np.float32
+
+    def binding_is_input(self, index):
+        return index % 2 == 0
+
+    def create_execution_context(self):
+        return Context(self.fake, self)
+
+
+def fake_modules(fake):
+    driver = types.ModuleType("pycuda.driver")
+    driver.Stream = lambda: Stream(fake)
+    driver.Event = lambda: Event(fake)
+    driver.pagelocked_empty = lambda size, dtype: np.zeros(size, dtype)
+
+    def mem_alloc(nbytes):
+        address = len(fake.memory) + 1
+        fake.memory[address] = np.zeros(nbytes // 4, dtype=np.float32)
+        return address
+    driver.mem_alloc = mem_alloc
+
+    def memcpy_htod_async(device, host, stream):
+        stream.ops.append(lambda: fake.memory[device].__setitem__(slice(0, host.size), host))
+    driver.memcpy_htod_async = memcpy_htod_async
+
+    def memcpy_dtoh_async(host, device, stream):
+        stream.ops.append(lambda: np.copyto(host, fake.memory[device][:host.size]))
+    driver.memcpy_dtoh_async = memcpy_dtoh_async
+
+    trt = types.ModuleType("tensorrt")
+    trt.__version__ = "0.0"
+    trt.volume = lambda shape: int(np.prod(shape))
+    trt.nptype = lambda dtype: dtype
+    trt.tensorrt = types.SimpleNamespace(ICudaEngine=Engine)
+
+    pycuda = types.ModuleType("pycuda")
+    pycuda.driver = driver
+    pycuda.autoinit = types.ModuleType("pycuda.autoinit")
+    return {"tensorrt": trt, "pycuda": pycuda, "pycuda.driver": driver, "pycuda.autoinit": pycuda.autoinit}
+
+
+class PushPop:
+    def push(self):
+        pass
+
+    def pop(self):
+        pass
+
+
+@pytest.fixture
+def make_backend(monkeypatch):
+    fake = FakeCuda()
+    for name, module in fake_modules(fake).items():
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.delitem(sys.modules, "backends.tensorrt", raising=False)
+    monkeypatch.setattr(hardware, "fingerprint", lambda *args, **kwargs: {"gpu": {"name": "fake"}})
+    tensorrt = importlib.import_module("backends.tensorrt")
+
+    def make(batch_size=4, num_streams=1, profile_copies=False, **engine_args):
+        backend = tensorrt.TRTBackend(
+            "tensorrt", batch_size=batch_size, num_streams=num_streams, profile_copies=profile_copies)
+        # what load_backend sets up, without an engine file
+        backend._ctx = PushPop()
+        backend._stream = Stream(fake)
+        backend._engine = Engine(fake, **engine_args)
+        backend._context = backend._engine.create_execution_context()
+        backend._allocate_slots()
+        backend.fake = fake
+        return backend
+    yield make
+    sys.modules.pop("backends.tensorrt", None)
+
+
+def expected(inputs):
+    return inputs.reshape(len(inputs), -1).sum(axis=1, keepdims=True) * np.arange(1, 5)
+
+
+def batches(count, batch_size):
+    rng = np.random.default_rng(0)
+    for start in range(0, count, batch_size):
+        ids = list(range(start, min(start + batch_size, count)))
+        yield ids, rng.random((len(ids), 3, 2, 2), dtype=np.float32), ids
+
+
+def test_call_runs_full_and_partial_batches(make_backend):
+    backend = make_backend(batch_size=4)
+    for ids, inputs, _ in batches(6, 4):
+        outputs, _ = backend(inputs)
+        np.testing.assert_allclose(outputs[0], expected(inputs), rtol=1e-6)
+
+
+def test_stream_yields_in_submission_order(make_backend):
+    backend = make_backend(batch_size=4, num_streams=3, profiles=3)
+    inputs = {tuple(ids): batch for ids, batch, _ in batches(30, 4)}
+
+    results = list(backend.stream(batches(30, 4)))
+
+    assert [ids for ids, _, _, _ in results] == [list(ids) for ids in inputs]
+    for ids, labels, outputs, latency in results:
+        assert labels == ids
+        np.testing.assert_allclose(outputs[0], expected(inputs[tuple(ids)]), rtol=1e-6)
+        assert latency > 0
+
+
+def test_stream_keeps_one_batch_per_slot_in_flight(make_backend):
+    backend = make_backend(batch_size=2, num_streams=3, profiles=3)
+    list(backend.stream(batches(20, 2)))
+    assert backend.fake.max_in_flight == 3
+    # each slot runs its own context on its own optimization profile
+    assert [slot['context'].profile for slot in backend._slots] == [0, 1, 2]
+    assert len({slot['stream'].handle for slot in backend._slots}) == 3
+
+
+def test_stream_outputs_survive_slot_reuse(make_backend):
+    backend = make_backend(batch_size=2, num_streams=2, profiles=2)
+    inputs = [batch for _, batch, _ in batches(10, 2)]
+    # keep every result until the end, the slots were reused in the meantime
+    results = list(backend.stream(batches(10, 2)))
+    for batch, (_, _, outputs, _) in zip(inputs, results):
+        np.testing.assert_allclose(outputs[0], expected(batch), rtol=1e-6)
+
+
+def test_dynamic_engine_needs_a_profile_per_stream(make_backend):
+    with pytest.raises(ValueError, match="optimization profiles"):
+        make_backend(num_streams=2, profiles=1)
+
+
+def test_implicit_batch_engine(make_backend):
+    backend = make_backend(batch_size=4, num_streams=2, implicit_batch=True)
+    results = list(backend.stream(batches(10, 4)))
+    for (ids, inputs, _), (_, _, outputs, _) in zip(batches(10, 4), results):
+        np.testing.assert_allclose(outputs[0], expected(inputs), rtol=1e-6)
+    with pytest.raises(ValueError, match="max batch size"):
+        make_backend(batch_size=16, implicit_batch=True)
+
+
+def test_profile_copies_splits_stages(make_backend):
+    backend = make_backend(batch_size=2, num_streams=2, profiles=2, profile_copies=True)
+    list(backend.stream(batches(8, 2)))
+    assert len(backend.stage_times["h2d"]) == 4
+    assert set(backend.get_stage_times()) == {"h2d", "compute", "d2h"}